@@ -1,79 +1,37 @@
+import time
+startup_started = time.perf_counter()
+
 import sys
-import zipfile
 from pathlib import Path
-from PIL import Image as PILImage
 from PySide6.QtWidgets import QGridLayout, QFileDialog, QLineEdit, QStackedWidget, QMessageBox, QSplashScreen, \
-    QApplication, QLabel, QPushButton, QVBoxLayout, QWidget, QScrollArea, QSizePolicy, QHBoxLayout
+    QApplication, QLabel, QPushButton, QVBoxLayout, QWidget, QListView, QStyledItemDelegate, QAbstractItemView, \
+    QStyle
 from PySide6.QtSvgWidgets import QSvgWidget
-from PySide6.QtGui import QIcon, QPixmap, QColor, QPainter, QBrush, QPainterPath, QMovie
-from PySide6.QtCore import Qt, QTimer, Signal, QThread
-import sqlite3
-from datetime import datetime
-import hashlib
-import base64
-from tkinter import messagebox
-import secrets
-import string
+from PySide6.QtGui import QIcon, QPixmap, QColor, QPainter, QBrush, QPainterPath, QMovie, QFont, QImage
+from PySide6.QtCore import Qt, QTimer, Signal, QThread, QAbstractListModel, QModelIndex, QSize, QObject, QRect
 import os
-import multiprocessing
-from concurrent.futures import ProcessPoolExecutor
-from collections import deque
-from difflib import SequenceMatcher
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+import threading
+
+# A lógica dos cofres vive no pacote imagecrypt, sem dependências da interface; este ficheiro é só a GUI
+from imagecrypt.lazy import PILImage, multiprocessing
+from imagecrypt.storage import open_data_dir, data_path, DatabaseCompactor, WipeStage
+from imagecrypt.search import SEARCH_ROOTS, PathSearcher, search_index
+from imagecrypt.vault import (create_vault, login_vault, verify_if_vault_name_exists, update_last_login,
+                              forget_vault_key, format_timestamp, get_vault_images_page, get_image_thumbnail,
+                              make_thumbnail, encode_image, list_folder_images, lock_images_batch,
+                              unlock_images_batch, delete_images_batch, ZipExportWriter, FileExportWriter)
+
+def show_message(title, message, icon=QMessageBox.Information):
+    # Só pode ser chamada na thread da interface; as tarefas em segundo plano reportam pelo JobQueue
+    QMessageBox(icon, title, message, QMessageBox.Ok, QApplication.activeWindow()).exec()
 
 def inner_path(relative):
     if getattr(sys, 'frozen', False):
         return os.path.join(sys._MEIPASS, relative)
     return os.path.join(os.path.abspath("."), relative)
 
-class PathSearcher:
-    def __init__(self, img_name):
-        self.found_paths = multiprocessing.Manager().list()
-        self.img_name = img_name.lower()
-        self.max_results = 6
-        self.search_image()
-
-    def search_image(self):
-        start_dirs = [
-            os.path.expanduser("~/Desktop"),
-            os.path.expanduser("~/Pictures"),
-            os.path.expanduser("~/Documents"),
-            os.path.expanduser("~/Photos"),
-            os.path.expanduser("~/Downloads")
-        ]
-
-        with ProcessPoolExecutor() as executor:
-            executor.map(self._search_in_directory, start_dirs)
-
-    def _search_in_directory(self, root_dir):
-        queue = deque([root_dir])
-
-        while queue and len(self.found_paths) < self.max_results:  # Interrompe quando 6 resultados são encontrados
-            current_dir = queue.popleft()
-            try:
-                with os.scandir(current_dir) as entries:
-                    for entry in entries:
-                        if entry.is_file():
-                            name, ext = os.path.splitext(entry.name.lower())
-                            if ext in {".jpg", ".jpeg", ".png", ".svg", ".bmp"}:
-                                similarity = self._calculate_similarity(name)  # Calcula a similaridade
-                                if similarity > 0.5:  # Adiciona à lista de resultados se a similaridade for suficientemente alta
-                                    self.found_paths.append((similarity, entry.path))  # Guarda também a similaridade
-                        elif entry.is_dir():
-                            queue.append(entry.path)
-            except (PermissionError, FileNotFoundError):
-                continue
-
-    def _calculate_similarity(self, file_name):
-        return SequenceMatcher(None, file_name, self.img_name).ratio()
-
-    def get_paths(self):
-        sorted_paths = sorted(self.found_paths, key=lambda x: x[0], reverse=True)
-        return [path for _, path in sorted_paths[:self.max_results]]
-
-program_data_dir = os.path.join(os.environ['PROGRAMDATA'], "ImageCrypt")
-os.makedirs(program_data_dir, exist_ok=True)
-db_path = os.path.join(program_data_dir, "imagecrypt.db")
-
 screen0 = inner_path("bg.svg")
 screen1 = inner_path("bg2.svg")
 screen2 = inner_path("bg3.svg")
@@ -86,232 +44,136 @@ searching_ic = inner_path("Searching IC.gif")
 
 icon_ic = inner_path("iconIC.ico")
 
-def generate_key(tamanho=16):
-    caracteres = string.ascii_letters + string.digits
-    return ''.join(secrets.choice(caracteres) for _ in range(tamanho))
-
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
-
-def init_db():
-    db_conn = sqlite3.connect(db_path)
-    cursor = db_conn.cursor()
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS vault (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            vault_name TEXT NOT NULL,
-            password TEXT NOT NULL,
-            created_at TEXT NOT NULL,
-            encryption_key TEXT,
-            last_login TEXT
-        )
-    """)
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS image (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            vault_id INTEGER NOT NULL,
-            image_name TEXT NOT NULL,
-            image_crypt_key TEXT NOT NULL,
-            created_at TEXT NOT NULL,
-            last_accessed TEXT,
-            FOREIGN KEY (vault_id) REFERENCES vault (id)
-        )
-    """)
-
-    db_conn.commit()
-    db_conn.close()
-
-def create_vault(hashed_password, vault_name):
-    created_at = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-    cv_db_conn = sqlite3.connect(db_path)
-    cursor = cv_db_conn.cursor()
-    encryption_key = generate_key()
-
-    cursor.execute("""
-        INSERT INTO vault (password, created_at, vault_name, encryption_key) 
-        VALUES (?, ?, ?, ?)
-    """, (hashed_password, created_at, vault_name, encryption_key))
-    cv_db_conn.commit()
-    cv_db_conn.close()
-    messagebox.showinfo("Sucesso", "Cofre criado com sucesso!")
-
-def login_vault(password):
-    hashed_password = hash_password(password)
-    lv_db_conn = sqlite3.connect(db_path)
-    cursor = lv_db_conn.cursor()
-
-    try:
-        cursor.execute("SELECT id, vault_name FROM vault WHERE password = ?", (hashed_password,))
-        vault = cursor.fetchone()
-        if vault:
-            vault_id = vault[0]
-            vault_name = vault[1]
-            atual_login = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-            last_login = get_last_login(vault_id)
-            lv_db_conn.commit()
-            lv_db_conn.close()
-            return vault_id, vault_name, last_login, atual_login
-        else:
-            messagebox.showerror("Erro", "Senha de acesso incorreta ou cofre inexistente.")
-    except Exception as e:
-        messagebox.showerror("Erro", f"Erro no login: {str(e)}")
-        return None
-    finally:
-        lv_db_conn.close()
-
-def get_last_login(vault_id):
-    ll_db_conn = sqlite3.connect(db_path)
-    cursor = ll_db_conn.cursor()
-    cursor.execute("SELECT last_login FROM vault WHERE id = ?", (vault_id,))
-    last_login_c = cursor.fetchone()
-    if last_login_c:
-        return last_login_c[0]
-    return None
-
-def get_vault_images(vault_id):
-    ll_db_conn = sqlite3.connect(db_path)
-    cursor = ll_db_conn.cursor()
-
-    cursor.execute("SELECT id, image_name, created_at FROM image WHERE vault_id = ?", (vault_id,))
-    result_c = cursor.fetchall()
-    ll_db_conn.close()
-    if not result_c:
-        return None
-    return {row[0]: list(row[1:]) for row in result_c}
-
-def update_last_login(vault_id, last_login):
-    ll_db_conn = sqlite3.connect(db_path)
-    cursor = ll_db_conn.cursor()
-    cursor.execute("""
-                    UPDATE vault 
-                    SET last_login = ?
-                    WHERE id = ?
-                """, (last_login, vault_id))
-    ll_db_conn.commit()
-    ll_db_conn.close()
-    return True
-
-def verify_if_vault_password_exists(hashed_password):
-    vve_db_conn = sqlite3.connect(db_path)
-    cursor = vve_db_conn.cursor()
-    try:
-        cursor.execute("SELECT id FROM vault WHERE password = ?", (hashed_password,))
-        vault = cursor.fetchone()
-        if vault:
-            messagebox.showerror("Crie outra senha", "Já existe cofre com a mesma senha de acesso.")
-            return True
-        else:
-            return False
-    except Exception as e:
-        messagebox.showerror("Erro", f"Base de dados alterada: {str(e)}")
-        return None
-    finally:
-        vve_db_conn.close()
-
-def encode_image(vault_id, image_path, img_name=None):
-    ei_db_conn = None
-    pimage_path = Path(image_path).resolve()
-
-    try:
-        with open(pimage_path, "rb") as img_file:
-            image_base64 = base64.b64encode(img_file.read()).decode('utf-8')
-
-        image_name = img_name if img_name else pimage_path.stem
-        created_at = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-
-        ei_db_conn = sqlite3.connect(db_path)
-        cursor = ei_db_conn.cursor()
-
-        cursor.execute("SELECT encryption_key FROM vault WHERE id = ?", (vault_id,))
-        encryption_key = cursor.fetchone()
-
-        image_crypt_key = encryption_key[0] + "" + image_base64
-
-        cursor.execute("""
-            INSERT INTO image (vault_id, image_name, image_crypt_key, created_at) 
-            VALUES (?, ?, ?, ?)
-        """, (vault_id, image_name, image_crypt_key, created_at))
-
-        ei_db_conn.commit()
-        messagebox.showinfo("Sucesso", "Imagem codificada com sucesso!")
-        return True
-
-    except Exception as e:
-        messagebox.showerror("Erro", f"Erro ao codificar a imagem: {str(e)}")
-        return False
-
-    finally:
-        ei_db_conn.close()
-
-def decode_image(img_id, vault_id):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
 
+THUMBNAIL_CACHE_BYTES = 16 * 1024 * 1024
+THUMBNAIL_WORKERS = 2
+
+class ThumbnailCache:
+    # LRU limitado pelos bytes das imagens descodificadas, não pelo número de entradas
+    def __init__(self, max_bytes=THUMBNAIL_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.images = OrderedDict()
+        self.size = 0
+
+    def get(self, key):
+        image = self.images.get(key)
+        if image is not None:
+            self.images.move_to_end(key)
+        return image
+
+    def put(self, key, image):
+        previous = self.images.pop(key, None)
+        if previous is not None:
+            self.size -= previous.sizeInBytes()
+        self.images[key] = image
+        self.size += image.sizeInBytes()
+        while self.size > self.max_bytes and len(self.images) > 1:
+            _, evicted = self.images.popitem(last=False)
+            self.size -= evicted.sizeInBytes()
+
+class ThumbnailLoader(QObject):
+    # As miniaturas são geradas/decifradas em threads próprias; a cache só é tocada pela thread da interface
+    loaded = Signal(object)
+    produced = Signal(object, object)
+
+    def __init__(self, parent=None, max_bytes=THUMBNAIL_CACHE_BYTES, workers=THUMBNAIL_WORKERS):
+        super().__init__(parent)
+        self.cache = ThumbnailCache(max_bytes)
+        self.pending = set()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnail")
+        self.produced.connect(self.on_produced)
+
+    def get(self, key, producer):
+        # Devolve a QImage em cache (nula se não houver miniatura possível) ou None, pedindo-a em segundo plano
+        image = self.cache.get(key)
+        if image is None and key not in self.pending:
+            self.pending.add(key)
+            self.executor.submit(self.produce, key, producer)
+        return image
+
+    def produce(self, key, producer):
+        try:
+            thumbnail = producer()
+        except PermissionError:
+            # Cofre bloqueado entretanto: não fica em cache, volta a ser pedida depois do login
+            self.produced.emit(key, None)
+            return
+        except Exception:
+            thumbnail = None
+        self.produced.emit(key, QImage.fromData(thumbnail) if thumbnail else QImage())
+
+    def on_produced(self, key, image):
+        self.pending.discard(key)
+        if image is None:
+            return
+        self.cache.put(key, image)
+        self.loaded.emit(key)
+
+    def file_thumbnail(self, image_path):
+        return self.get(("file", image_path), lambda: make_thumbnail(image_path))
+
+    def vault_thumbnail(self, vault_id, img_id):
+        return self.get(("image", vault_id, img_id), lambda: get_image_thumbnail(vault_id, img_id))
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+PREVIEW_SIZE = 338
+PREVIEW_RADIUS = 20
+
+def render_preview(image_path, size=PREVIEW_SIZE, radius=PREVIEW_RADIUS):
+    # Corre fora da thread da interface: só usa QImage, que, ao contrário de QPixmap, pode ser criada em qualquer thread
     try:
-        cursor.execute("""
-                SELECT image_crypt_key FROM image 
-                WHERE vault_id = ? AND id = ?
-            """, (vault_id, img_id))
-        result_image_key = cursor.fetchone()
-
-        if not result_image_key:
-            messagebox.showerror("Erro", "Imagem não encontrada")
-            conn.close()
-            return None
-
-        image_crypt_key = result_image_key[0]
-
-        cursor.execute("""
-                SELECT encryption_key FROM vault 
-                WHERE id = ? 
-            """, (vault_id,))
-
-        result_vault_key = cursor.fetchone()
-
-        if not result_vault_key:
-            messagebox.showerror("Erro", "Cofre não encontrado")
-            conn.close()
-            return None
-
-        encryption_key = result_vault_key[0]
-
-        if encryption_key in image_crypt_key:
-            encoded_image = image_crypt_key.replace(encryption_key, "")
-            conn.close()
-            return base64.b64decode(encoded_image)
-        messagebox.showerror("Erro", "A imagem não pertence ao cofre")
-        return None
-    except Exception as e:
-        messagebox.showerror("Erro", f"Erro ao descodificar a imagem: {str(e)}")
-        return None
-    finally:
-        conn.close()
+        with PILImage.open(image_path) as img:
+            # Em JPEG, draft descodifica já a uma escala próxima do tamanho final
+            img.draft("RGB", (size, size))
+            img = img.convert("RGBA").resize((size, size), PILImage.Resampling.LANCZOS)
+            source = QImage(img.tobytes(), size, size, 4 * size, QImage.Format_RGBA8888).copy()
+    except (OSError, ValueError, SyntaxError):
+        # O PIL não lê SVG: fica a cargo dos plugins de imagem do Qt
+        source = QImage(image_path)
+        if source.isNull():
+            return source
+        source = source.scaled(size, size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+
+    preview = QImage(size, size, QImage.Format_ARGB32_Premultiplied)
+    preview.fill(Qt.transparent)
+    painter = QPainter(preview)
+    painter.setRenderHint(QPainter.Antialiasing)
+    path = QPainterPath()
+    path.addRoundedRect(0, 0, size, size, radius, radius)
+    painter.setClipPath(path)
+    painter.drawImage(0, 0, source)
+    painter.end()
+    return preview
+
+class PreviewWorker(QThread):
+    # Tal como no Worker da pesquisa, o sinal não se chama finished para não esconder o do QThread
+    preview_ready = Signal(str, QImage)
+
+    def __init__(self, image_path):
+        super().__init__()
+        self.image_path = image_path
 
-def delete_image_from_db(img_id):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    try:
-        cursor.execute("DELETE FROM image WHERE id = ?", (img_id,))
-        conn.commit()
-        return True
-    except Exception as e:
-        messagebox.showerror("Erro", f"Erro ao eliminar imagem do cofre: {str(e)}")
-        return False
-    finally:
-        conn.close()
+    def run(self):
+        self.preview_ready.emit(self.image_path, render_preview(self.image_path))
 
 class PopupWindow(QWidget):
 
     image_clicked = Signal(str)
+    closed = Signal()
 
-    def __init__(self, image_list):
+    def __init__(self, image_list, thumbnails):
         super().__init__()
+        self.thumbnails = thumbnails
+        self.image_labels = {}
+        thumbnails.loaded.connect(self.on_thumbnail_loaded)
 
         self.setFixedSize(400, 400)
         self.setWindowFlags(Qt.FramelessWindowHint)
         self.setAttribute(Qt.WA_TranslucentBackground)
+        # Destruído pelo Qt na thread da interface ao fechar, e não pelo garbage collector noutra thread
+        self.setAttribute(Qt.WA_DeleteOnClose)
 
         self.layout = QVBoxLayout(self)
         self.layout.setContentsMargins(54, 54, 54, 54)
@@ -342,13 +204,30 @@ class PopupWindow(QWidget):
 
         self.layout.addLayout(self.grid_layout)
 
+    def set_images(self, image_list):
+        # Resultados parciais da pesquisa: reconstrói a grelha só quando a lista muda
+        if image_list == self.image_list:
+            return
+        self.image_list = image_list
+        while self.grid_layout.count():
+            item = self.grid_layout.takeAt(0)
+            if item.widget():
+                item.widget().deleteLater()
+        self.image_labels = {}
+        self.add_images_to_grid()
+
+    def closeEvent(self, event):
+        self.closed.emit()
+        super().closeEvent(event)
+
     def add_images_to_grid(self):
         row, col = 0, 0
         for image_path in self.image_list:
             image_label = QLabel()
-            pixmap = QPixmap(image_path)
-            image_label.setPixmap(pixmap.scaled(80, 80, Qt.KeepAspectRatio, Qt.SmoothTransformation))
+            image_label.setFixedSize(80, 80)
             image_label.setAlignment(Qt.AlignCenter)
+            self.image_labels[image_path] = image_label
+            self.set_thumbnail(image_label, self.thumbnails.file_thumbnail(image_path))
 
             name_label = QLabel(os.path.basename(image_path))
             name_label.setAlignment(Qt.AlignCenter)
@@ -370,6 +249,15 @@ class PopupWindow(QWidget):
                 col = 0
                 row += 1
 
+    @staticmethod
+    def set_thumbnail(image_label, image):
+        if image is not None and not image.isNull():
+            image_label.setPixmap(QPixmap.fromImage(image).scaled(80, 80, Qt.KeepAspectRatio, Qt.SmoothTransformation))
+
+    def on_thumbnail_loaded(self, key):
+        if key[0] == "file" and key[1] in self.image_labels:
+            self.set_thumbnail(self.image_labels[key[1]], self.thumbnails.cache.get(key))
+
     def on_image_clicked(self, image_path):
         self.image_clicked.emit(image_path)
         self.close()
@@ -386,19 +274,240 @@ class PopupWindow(QWidget):
 
 
 class Worker(QThread):
-    finished = Signal(list)
+    partial = Signal(list)
+    # Não pode chamar-se finished: esconderia o QThread.finished, que indica quando a thread terminou mesmo
+    results_ready = Signal(list)
 
     def __init__(self, search_term):
         super().__init__()
         self.search_term = search_term
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
 
     def run(self):
-        image_paths = PathSearcher(self.search_term).get_paths()
-        self.finished.emit(image_paths)  # Emite o sinal com os resultados
+        searcher = PathSearcher(self.search_term, on_partial=self.partial.emit, cancel_event=self.cancel_event)
+        self.results_ready.emit([] if self.cancel_event.is_set() else searcher.get_paths())  # Emite o sinal com os resultados
+
+class VaultImageListModel(QAbstractListModel):
+    image_id_role = Qt.UserRole
+    created_at_role = Qt.UserRole + 1
+    thumbnail_role = Qt.UserRole + 2
+    fetch_batch = 200
+
+    def __init__(self, vault_id, thumbnails, parent=None):
+        super().__init__(parent)
+        self.vault_id = vault_id
+        self.rows = []
+        self.exhausted = vault_id is None
+        # Só as linhas desenhadas pedem a miniatura, por isso só as visíveis são decifradas
+        self.thumbnails = thumbnails
+        thumbnails.loaded.connect(self.on_thumbnail_loaded)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        img_id, image_name, created_at = self.rows[index.row()]
+        if role == Qt.DisplayRole:
+            return image_name
+        if role == self.image_id_role:
+            return img_id
+        if role == self.created_at_role:
+            return format_timestamp(created_at)
+        if role == self.thumbnail_role:
+            return self.thumbnails.vault_thumbnail(self.vault_id, img_id)
+        return None
 
-class MainWindow(QWidget):
-    init_db()
+    def on_thumbnail_loaded(self, key):
+        if key[0] != "image" or key[1] != self.vault_id:
+            return
+        for row, image in enumerate(self.rows):
+            if image[0] == key[2]:
+                index = self.index(row)
+                self.dataChanged.emit(index, index, [self.thumbnail_role])
+                break
+
+    def set_vault(self, vault_id):
+        self.beginResetModel()
+        self.vault_id = vault_id
+        self.rows = []
+        self.exhausted = vault_id is None
+        self.endResetModel()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.exhausted:
+            return
+        after = (self.rows[-1][2], self.rows[-1][0]) if self.rows else None
+        page_rows = get_vault_images_page(self.vault_id, after, self.fetch_batch)
+        if len(page_rows) < self.fetch_batch:
+            self.exhausted = True
+        if page_rows:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page_rows) - 1)
+            self.rows.extend(page_rows)
+            self.endInsertRows()
+
+    def remove_image_ids(self, image_ids):
+        image_ids = set(image_ids)
+        positions = [row for row, image in enumerate(self.rows) if image[0] in image_ids]
+        # Remove de trás para a frente em blocos contíguos para não invalidar as posições seguintes
+        while positions:
+            last = positions.pop()
+            first = last
+            while positions and positions[-1] == first - 1:
+                first = positions.pop()
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self.rows[first:last + 1]
+            self.endRemoveRows()
+
+class VaultImageDelegate(QStyledItemDelegate):
+    row_height = 40
+    spacing = 5
+    thumbnail_size = 32
+
+    def sizeHint(self, option, index):
+        return QSize(0, self.row_height + self.spacing)
+
+    def paint(self, painter, option, index):
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        rect = option.rect.adjusted(0, 0, 0, -self.spacing)
+
+        if option.state & QStyle.State_Selected:
+            path = QPainterPath()
+            path.addRoundedRect(rect, 4, 4)
+            painter.fillPath(path, QColor("#9F81C6"))
+
+        margin = (rect.height() - self.thumbnail_size) // 2
+        thumbnail_rect = QRect(rect.left() + margin, rect.top() + margin, self.thumbnail_size, self.thumbnail_size)
+        thumbnail = index.data(VaultImageListModel.thumbnail_role)
+        if thumbnail is not None and not thumbnail.isNull():
+            scaled = thumbnail.scaled(thumbnail_rect.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            target = QRect(0, 0, scaled.width(), scaled.height())
+            target.moveCenter(thumbnail_rect.center())
+            painter.drawImage(target, scaled)
+        else:
+            placeholder = QPainterPath()
+            placeholder.addRoundedRect(thumbnail_rect, 4, 4)
+            painter.fillPath(placeholder, QColor("#D9D2E0"))
+
+        text_rect = rect.adjusted(self.thumbnail_size + 2 * margin, 0, -10, 0)
+        font = QFont(option.font)
+        font.setPixelSize(12)
+        painter.setFont(font)
+        painter.setPen(QColor("#000"))
+        painter.drawText(text_rect, Qt.AlignLeft | Qt.AlignVCenter, index.data(Qt.DisplayRole))
+
+        font.setPixelSize(10)
+        painter.setFont(font)
+        painter.setPen(QColor("#555"))
+        painter.drawText(text_rect, Qt.AlignRight | Qt.AlignVCenter, index.data(VaultImageListModel.created_at_role))
+        painter.restore()
+
+class Job:
+    # work(progress_callback, cancel_event) corre na thread da fila e devolve (concluídos, falhados)
+    def __init__(self, title, work, on_finished=None):
+        self.title = title
+        self.work = work
+        self.on_finished = on_finished
+        self.cancel_event = threading.Event()
+        self.future = None
+        self.done = 0
+        self.total = 0
+
+class JobQueue(QObject):
+    # Fila das operações demoradas (trancar, destrancar, apagar): a interface continua a responder
+    # e, quando a fila esvazia, é mostrado um único aviso com o resultado de todas as tarefas
+    status_changed = Signal(str)
+    drained = Signal(list)
+    job_progress = Signal(object, int, int)
+    job_finished = Signal(object, object, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # Uma tarefa de cada vez: cada uma já reparte o trabalho pelos seus próprios workers
+        # e as escritas no cofre seriam serializadas pelo SQLite de qualquer forma
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job")
+        self.jobs = []
+        self.results = []
+        # Emitidos na thread da fila, entregues na thread da interface
+        self.job_progress.connect(self.on_job_progress)
+        # Sempre em fila, mesmo quando emitido na thread da interface (track de um future já concluído)
+        self.job_finished.connect(self.on_job_finished, Qt.QueuedConnection)
+
+    def submit(self, title, work, on_finished=None):
+        job = Job(title, work, on_finished)
+        job.future = self.executor.submit(self.run_job, job)
+        self.jobs.append(job)
+        self.update_status()
+        return job
+
+    def run_job(self, job):
+        try:
+            done, failed = job.work(lambda done, total: self.job_progress.emit(job, done, total), job.cancel_event)
+        except Exception as e:
+            done, failed = [], [(None, str(e))]
+        self.job_finished.emit(job, done, failed)
+
+    def is_busy(self):
+        return bool(self.jobs)
+
+    def track(self, title, future):
+        # Trabalho que corre fora da fila (a limpeza dos originais): entra no estado e no aviso final,
+        # mas não ocupa a thread da fila nem é cancelado com as restantes tarefas
+        job = Job(title, None)
+        job.future = future
+        self.jobs.append(job)
+        self.update_status()
+        future.add_done_callback(lambda future: self.job_finished.emit(job, *future.result()))
+        return job
+
+    def cancel_all(self):
+        for job in list(self.jobs):
+            if job.work is None:
+                continue
+            job.cancel_event.set()
+            if job.future.cancel():
+                # Ainda estava na fila: sai sem chegar a correr
+                self.on_job_finished(job, [], [])
+
+    def shutdown(self):
+        self.cancel_all()
+        self.executor.shutdown(wait=True)
+
+    def on_job_progress(self, job, done, total):
+        job.done, job.total = done, total
+        self.update_status()
+
+    def on_job_finished(self, job, done, failed):
+        if job not in self.jobs:
+            return
+        self.jobs.remove(job)
+        if job.on_finished:
+            job.on_finished(done, failed)
+        self.results.append((job.title, done, failed, job.cancel_event.is_set()))
+        self.update_status()
+        if not self.jobs:
+            results, self.results = self.results, []
+            self.drained.emit(results)
+
+    def update_status(self):
+        if not self.jobs:
+            self.status_changed.emit("")
+            return
+        job = self.jobs[0]
+        status = f"{job.title}: {job.done} de {job.total}" if job.total else f"{job.title}..."
+        if len(self.jobs) > 1:
+            status += f" (+{len(self.jobs) - 1} na fila)"
+        self.status_changed.emit(status)
 
+class MainWindow(QWidget):
     def __init__(self):
         super().__init__()
         self.vault_name = None
@@ -406,8 +515,6 @@ class MainWindow(QWidget):
         self.last_login = None
         self.atual_login = None
 
-        self.images_list = {}
-
         self.pages = QStackedWidget(self)
 
         self.setWindowTitle("ImageCrypt")
@@ -415,38 +522,59 @@ class MainWindow(QWidget):
         self.setFixedSize(800, 600)
 
         self.pages = QStackedWidget(self)
-
-        self.login_page = self.show_login_page()
-        self.novo_cofre_page = self.show_novo_cofre_page()
-        self.lock_image_page = self.show_lock_image_page()
-        self.unlock_image_page = self.show_unlock_image_page()
-
-        self.pages.addWidget(self.login_page)
-        self.pages.addWidget(self.novo_cofre_page)
-        self.pages.addWidget(self.lock_image_page)
-        self.pages.addWidget(self.unlock_image_page)
+        self.thumbnails = ThumbnailLoader(self)
+        self.compactor = DatabaseCompactor()
+        self.wiper = WipeStage()
+        # Recupera o espaço deixado livre em sessões anteriores
+        self.compactor.schedule()
+        self.jobs = JobQueue(self)
+        self.jobs.drained.connect(self.show_jobs_summary)
+
+        # As páginas só são construídas na primeira visita e depois reutilizadas
+        self.page_builders = {
+            "login": self.show_login_page,
+            "novo_cofre": self.show_novo_cofre_page,
+            "lock": self.show_lock_image_page,
+            "unlock": self.show_unlock_image_page,
+        }
+        self.built_pages = {}
 
         layout = QVBoxLayout(self)
         layout.addWidget(self.pages)
 
         layout.setContentsMargins(0, 0, 0, 0)
         layout.setSpacing(0)
-        self.pages.setCurrentWidget(self.login_page)
+        self.open_page("login")
 
     def closeEvent(self, event):
         update_last_login(self.vault_id, self.atual_login)
+        self.jobs.shutdown()
+        self.wiper.shutdown()
+        self.compactor.shutdown()
+        forget_vault_key(self.vault_id)
+        self.thumbnails.shutdown()
         super().closeEvent(event)
 
-    def reload_work_pages(self):
-        self.pages.removeWidget(self.lock_image_page)
-        self.lock_image_page.deleteLater()
-        self.lock_image_page = self.show_lock_image_page()
-        self.pages.addWidget(self.lock_image_page)
+    def get_page(self, name):
+        page = self.built_pages.get(name)
+        if page is None:
+            page = self.page_builders[name]()
+            self.pages.addWidget(page)
+            self.built_pages[name] = page
+        return page
 
-        self.pages.removeWidget(self.unlock_image_page)
-        self.unlock_image_page.deleteLater()
-        self.unlock_image_page = self.show_unlock_image_page()
-        self.pages.addWidget(self.unlock_image_page)
+    def open_page(self, name):
+        self.pages.setCurrentWidget(self.get_page(name))
+
+    def refresh_vault_bindings(self):
+        # Atualiza apenas o que depende do cofre nas páginas de trabalho já construídas
+        for name in ("lock", "unlock"):
+            page = self.built_pages.get(name)
+            if page is None:
+                continue
+            page.vault_name_label.setText(f"Cofre: {self.vault_name}")
+            page.last_login_label.setText(f"Último acesso: {format_timestamp(self.last_login)}")
+            page.reset_vault_state()
 
     ############################# SHOW SCREEN METHODS #############################
 
@@ -465,17 +593,25 @@ class MainWindow(QWidget):
                 }
             """)
         password_label.setFixedSize(200, 40)
-        password_label.move(395, 160)
+        password_label.move(395, 110)
         #endregion
 
         #region ::::::::::::::::::::Botão "Entrar"::::::::::::::::::::
         def entrar_action():
-            result = login_vault(password_input.text())
+            try:
+                result = login_vault(vault_name_input.text().strip(), password_input.text())
+            except Exception as e:
+                show_message("Erro", f"Erro no login: {str(e)}", QMessageBox.Critical)
+                result = None
+            else:
+                if not result:
+                    show_message("Erro", "Senha de acesso incorreta ou cofre inexistente.", QMessageBox.Critical)
             if result:
                 password_input.clear()
+                vault_name_input.clear()
                 self.vault_id, self.vault_name, self.last_login, self.atual_login = result
-                self.reload_work_pages()
-                self.pages.setCurrentWidget(self.lock_image_page)
+                self.refresh_vault_bindings()
+                self.open_page("lock")
             else:
                 password_input.clear()
 
@@ -498,6 +634,15 @@ class MainWindow(QWidget):
         entrar.clicked.connect(entrar_action)
         #endregion
 
+        #region ::::::::::::::::::::Input de nome do cofre::::::::::::::::::::
+        vault_name_input = QLineEdit(page)
+        vault_name_input.setEchoMode(QLineEdit.Normal)
+        vault_name_input.setPlaceholderText("Nome do cofre")
+        vault_name_input.setFixedSize(300, 40)
+        vault_name_input.move(300, 165)
+        vault_name_input.returnPressed.connect(lambda: password_input.setFocus())
+        #endregion
+
         #region ::::::::::::::::::::Input de senha::::::::::::::::::::
         password_input = QLineEdit(page)
         password_input.setEchoMode(QLineEdit.Password)
@@ -540,7 +685,7 @@ class MainWindow(QWidget):
         """)
         novo_cofre.setFixedSize(150, 50)
         novo_cofre.move(300, 320)
-        novo_cofre.clicked.connect(lambda: self.pages.setCurrentWidget(self.novo_cofre_page))
+        novo_cofre.clicked.connect(lambda: self.open_page("novo_cofre"))
         #endregion
         return page
 
@@ -551,26 +696,33 @@ class MainWindow(QWidget):
 
         def criar_cofre_action():
             password = password_input.text()
-            hashed_password = ""
             if len(password) < 8:
                 self.show_dialog("Senha Curta", "Adicione mais caracteres", "A senha deve conter pelo menos 8 caracteres.", QMessageBox.Warning, 1)
                 password_input.clear()
-            else:
-                hashed_password = hash_password(password)
+                password = ""
 
-            vault_name = vault_name_input.text()
+            vault_name = vault_name_input.text().strip()
             if not vault_name:
                 self.show_dialog("Cofre sem nome", "Nomeie o seu cofre", "É necessário dar um nome ao cofre antes de proceder com o seu registo.", QMessageBox.Warning, 1)
 
-            if vault_name and hashed_password:
+            if vault_name and password:
                 answer = self.show_dialog("Criar Cofre", "Confirme", "Deseja criar o cofre?", QMessageBox.Question, 3)
                 if answer == QMessageBox.Yes:
-                    already_exists = verify_if_vault_password_exists(hashed_password)
-                    if already_exists:
-                        password_input.clear()
+                    try:
+                        already_exists = verify_if_vault_name_exists(vault_name)
+                    except Exception as e:
+                        show_message("Erro", f"Base de dados alterada: {str(e)}", QMessageBox.Critical)
+                        already_exists = None
                     else:
-                        create_vault(hashed_password, vault_name)
-                        self.pages.setCurrentWidget(self.login_page)
+                        if already_exists:
+                            show_message("Escolha outro nome", "Já existe um cofre com o mesmo nome.",
+                                         QMessageBox.Critical)
+                    if already_exists is not False:
+                        vault_name_input.setFocus()
+                    else:
+                        create_vault(password, vault_name)
+                        show_message("Sucesso", "Cofre criado com sucesso!")
+                        self.open_page("login")
                         password_input.clear()
                         vault_name_input.clear()
 
@@ -671,11 +823,14 @@ class MainWindow(QWidget):
         """)
         voltar.setFixedSize(90, 50)
         voltar.move(300, 340)
-        voltar.clicked.connect(lambda: self.pages.setCurrentWidget(self.login_page))
+        voltar.clicked.connect(lambda: self.open_page("login"))
         #endregion
         return page
 
     def show_lock_image_page(self):
+        # Prepara o índice da pesquisa profunda enquanto o utilizador ainda não pesquisou
+        search_index.refresh_in_background(SEARCH_ROOTS)
+
         page = QWidget()
         svg_widget = QSvgWidget(screen1, page)
         svg_widget.setParent(page)
@@ -704,99 +859,163 @@ class MainWindow(QWidget):
 
         page.loading_label.hide()
 
+        page.preview_workers = set()
+
         def on_image_selected(image_path):
             page.image_path_selected = image_path
-            img = PILImage.open(image_path)
-            size = 338
-            img = img.resize((size, size), PILImage.Resampling.LANCZOS)
             pimage_path = Path(image_path)
 
             if not image_rename.text():
                 image_rename.setText(pimage_path.stem)
 
-            img.save("temp_resized_image.png", format="PNG")
+            # A pré-visualização é gerada em memória numa thread à parte; nada é escrito no disco
+            worker = PreviewWorker(image_path)
+            worker.preview_ready.connect(on_preview_ready)
+            # A referência só é largada quando a thread terminou de facto
+            worker.finished.connect(lambda worker=worker: page.preview_workers.discard(worker))
+            page.preview_workers.add(worker)
+            worker.start()
 
+            page.imgb_close.setVisible(True)
+            trancar.setStyleSheet("""
+                QPushButton {
+                    border-radius: 10px;
+                    background-color: #6B1A6F; 
+                    font-size: 10px;               
+                    outline: none;
+                    color: white;
+                }
+            """)
+
+        def on_preview_ready(image_path, preview):
+            # Ignora pré-visualizações de uma seleção entretanto substituída ou removida
+            if image_path != page.image_path_selected:
+                return
+            size = PREVIEW_SIZE
             page.imgb.setStyleSheet(f"""
                 QPushButton {{
-                    background-image: url(temp_resized_image.png);
-                    background-repeat: no-repeat;
-                    background-position: center;
                     width: {size}px;
                     height: {size}px;
                     border: none;
-                    border-radius: 20px;
+                    border-radius: {PREVIEW_RADIUS}px;
                     outline: none;
                 }}
             """)
-
+            page.imgb.setIcon(QIcon(QPixmap.fromImage(preview)))
+            page.imgb.setIconSize(QSize(size, size))
             page.imgb.setFixedSize(size, size)
             page.imgb.move(164, 230)
 
-            page.imgb_close.setVisible(True)
-            trancar.setStyleSheet("""
-                QPushButton {
-                    border-radius: 10px;
-                    background-color: #6B1A6F; 
-                    font-size: 10px;               
-                    outline: none;
-                    color: white;
-                }
-            """)
-            os.remove("temp_resized_image.png")
+        page.worker = None
+        page.popup = None
+        # Todas as threads de pesquisa ainda em execução, incluindo as canceladas, para não serem destruídas a meio
+        page.search_workers = set()
+        # Popups fechados ficam aqui até o Qt os destruir (WA_DeleteOnClose)
+        page.closed_popups = set()
+
+        def cancel_search():
+            worker = page.worker
+            if worker is None:
+                return
+            page.worker = None
+            worker.cancel()
+            worker.partial.disconnect(on_search_partial)
+            worker.results_ready.disconnect(on_search_finished)
+            page.movie.stop()
+            page.loading_label.hide()
+
+        def release_popup(popup):
+            page.closed_popups.add(popup)
+            popup.destroyed.connect(lambda _=None, popup=popup: page.closed_popups.discard(popup))
+
+        def close_popup():
+            if page.popup is not None:
+                popup, page.popup = page.popup, None
+                popup.closed.disconnect(on_popup_closed)
+                release_popup(popup)
+                popup.close()
+
+        def on_popup_closed():
+            release_popup(page.popup)
+            page.popup = None
+            cancel_search()
 
         def pesquisa_action():
             search_term = deep_search.text()
             if search_term:
+                # Uma nova pesquisa cancela a anterior e o popup que ela tenha aberto
+                cancel_search()
+                close_popup()
                 page.loading_label.show()
                 page.movie.start()
 
-                # Crie a thread Worker e conecte o sinal finished à função on_search_finished
-                page.worker = Worker(search_term)
-                page.worker.finished.connect(on_search_finished)
-                page.worker.start()
+                # Crie a thread Worker e conecte os sinais partial e results_ready
+                worker = Worker(search_term)
+                worker.partial.connect(on_search_partial)
+                worker.results_ready.connect(on_search_finished)
+                worker.finished.connect(lambda worker=worker: page.search_workers.discard(worker))
+                page.search_workers.add(worker)
+                page.worker = worker
+                worker.start()
             else:
                 QMessageBox.information(self, "Campo vazio", "Escreva antes o nome da imagem que quer procurar.")
 
+        def show_search_results(image_paths):
+            if page.popup is None:
+                # Exibe o popup com as imagens encontradas
+                page.popup = PopupWindow(image_paths, self.thumbnails)
+                page.popup.image_clicked.connect(lambda path: on_image_selected(path))
+                page.popup.closed.connect(on_popup_closed)
+                page.popup.move(self.geometry().center() - page.popup.rect().center())
+                page.popup.show()
+            else:
+                page.popup.set_images(image_paths)
+
+        def on_search_partial(image_paths):
+            if image_paths:
+                show_search_results(image_paths)
+
         def on_search_finished(image_paths):
+            page.worker = None
             # Oculta o GIF de loading
             page.movie.stop()
             page.loading_label.hide()
 
             if image_paths:
-                # Exibe o popup com as imagens encontradas
-                popup = PopupWindow(image_paths)
-                popup.image_clicked.connect(lambda path: on_image_selected(path))
-                popup.move(self.geometry().center() - popup.rect().center())
-                popup.show()
+                show_search_results(image_paths)
             else:
+                close_popup()
                 QMessageBox.information(self, "Inexistente", "Nenhuma imagem com nome parecido foi encontrada!")
 
         # region _____________login details_____________
-        vault_name_label = QLabel(f"Cofre: {self.vault_name}", page)
-        vault_name_label.setStyleSheet("""
+        page.vault_name_label = QLabel(f"Cofre: {self.vault_name}", page)
+        page.vault_name_label.setStyleSheet("""
                         QLabel {
                             font-size: 18px;
                             color: #534858;
                         }
                     """)
-        vault_name_label.setFixedSize(200, 40)
-        vault_name_label.move(150, 5)
+        page.vault_name_label.setFixedSize(200, 40)
+        page.vault_name_label.move(150, 5)
 
-        last_login_label = QLabel(f"Último acesso: {self.last_login}", page)
-        last_login_label.setStyleSheet("""
+        page.last_login_label = QLabel(f"Último acesso: {format_timestamp(self.last_login)}", page)
+        page.last_login_label.setStyleSheet("""
                         QLabel {
                             font-size: 10px;
                             color: #534858;
                         }
                     """)
-        last_login_label.setFixedSize(200, 40)
-        last_login_label.move(150, 25)
+        page.last_login_label.setFixedSize(200, 40)
+        page.last_login_label.move(150, 25)
         # endregion
 
         # region :::::::::::Botão "sair":::::::::::
         def sair_action():
             update_last_login(self.vault_id, self.atual_login)
-            self.pages.setCurrentWidget(self.login_page)
+            # Só cancela: a fila continua viva para o próximo login e a janela não espera pelo lote em curso
+            self.jobs.cancel_all()
+            forget_vault_key(self.vault_id)
+            self.open_page("login")
 
         sair = QPushButton("", page)
         sair.setStyleSheet("""
@@ -856,6 +1075,7 @@ class MainWindow(QWidget):
             """)
             image_rename.clear()
             page.image_path_selected = None
+            page.imgb.setIcon(QIcon())
             page.imgb.setStyleSheet("""
                 QPushButton {
                     background: none;
@@ -866,6 +1086,7 @@ class MainWindow(QWidget):
             page.imgb_close.setVisible(False)
 
         page.imgb_close.clicked.connect(remove_imgb_img)
+        page.reset_vault_state = remove_imgb_img
         # endregion
 
         # region :::::::::::Input de pesquisa profunda:::::::::::
@@ -992,29 +1213,46 @@ class MainWindow(QWidget):
         ano_bar.clicked.connect(toggle_button)
         ano_circle.clicked.connect(toggle_button)
 
-        def delete_image_from_origin(image_path):
-            if os.path.exists(image_path):
-                try:
-                    os.remove(image_path)
-                except Exception as e:
-                    print(f"Erro ao apagar a imagem: {e}")
-            else:
-                print(f"Imagem '{image_path}' não encontrada.")
-
         # endregion
 
         # region :::::::::::Botão "trancar":::::::::::
+        def refresh_unlock_list(locked, failed):
+            # A lista de imagens trancadas pode já estar aberta se o utilizador mudou de página durante a tarefa
+            unlock_page = self.built_pages.get("unlock")
+            if locked and unlock_page is not None:
+                unlock_page.images_model.set_vault(self.vault_id)
+
+        def lock_finished(wipe_futures):
+            # Os originais são entregues à limpeza ainda na thread da tarefa (para não ficarem por apagar se a
+            # janela fechar entretanto); aqui o resultado da limpeza passa a contar para o aviso final
+            def on_finished(locked, failed):
+                refresh_unlock_list(locked, failed)
+                for future in wipe_futures:
+                    self.jobs.track(f"Apagar {len(locked)} original(is)", future)
+            return on_finished
+
         def trancar_action():
             if page.image_path_selected:
                 additional_info = "\n(Após a trancagem, a mesma será removida do dispositivo)" if page.toggle_state else ""
                 answer = self.show_dialog("Trancar Imagem", "Confirme", f"Deseja trancar essa imagem?{additional_info}",
                                           QMessageBox.Question, 3)
                 if answer == QMessageBox.Yes:
-                    successfully_encoded = encode_image(self.vault_id, page.image_path_selected, image_rename.text())
-                    if successfully_encoded:
-                        if page.toggle_state:
-                            delete_image_from_origin(page.image_path_selected)
-                        remove_imgb_img()
+                    vault_id = self.vault_id
+                    image_path = page.image_path_selected
+                    image_name = image_rename.text()
+                    remove_origin = page.toggle_state
+                    wipe_futures = []
+
+                    def lock_work(progress_callback, cancel_event):
+                        progress_callback(0, 1)
+                        encode_image(vault_id, image_path, image_name)
+                        if remove_origin:
+                            wipe_futures.append(self.wiper.submit([image_path]))
+                        progress_callback(1, 1)
+                        return [image_path], []
+
+                    self.jobs.submit("Trancar imagem", lock_work, lock_finished(wipe_futures))
+                    remove_imgb_img()
 
         trancar = QPushButton("Trancar imagem", page)
         trancar.setStyleSheet("""
@@ -1033,11 +1271,75 @@ class MainWindow(QWidget):
         trancar.clicked.connect(trancar_action)
         # endregion
 
+        # region :::::::::::Botões "trancar pasta" e "trancar seleção":::::::::::
+        def trancar_lote_action(image_paths):
+            if not image_paths:
+                QMessageBox.information(self, "Sem imagens", "Nenhuma imagem encontrada para trancar.")
+                return
+
+            additional_info = "\n(Após a trancagem, as mesmas serão removidas do dispositivo)" if page.toggle_state else ""
+            answer = self.show_dialog("Trancar Imagens", "Confirme",
+                                      f"Deseja trancar {len(image_paths)} imagem(s)?{additional_info}",
+                                      QMessageBox.Question, 3)
+            if answer == QMessageBox.Yes:
+                vault_id = self.vault_id
+                remove_origin = page.toggle_state
+                wipe_futures = []
+
+                def lock_batch_work(progress_callback, cancel_event):
+                    progress_callback(0, len(image_paths))
+                    locked, failed = lock_images_batch(vault_id, image_paths, progress_callback,
+                                                       cancel_event=cancel_event)
+                    if remove_origin and locked:
+                        wipe_futures.append(self.wiper.submit(locked))
+                    return locked, failed
+
+                self.jobs.submit(f"Trancar {len(image_paths)} imagem(s)", lock_batch_work,
+                                 lock_finished(wipe_futures))
+
+        def trancar_pasta_action():
+            folder = QFileDialog.getExistingDirectory(self, "Selecione uma Pasta")
+            if folder:
+                trancar_lote_action(list_folder_images(folder))
+
+        def trancar_selecao_action():
+            files, _ = QFileDialog.getOpenFileNames(self, "Selecione as Imagens", "",
+                                                    "Imagens (*.png *.jpg *.bmp *.jpeg);")
+            if files:
+                trancar_lote_action(files)
+
+        batch_button_style = """
+            QPushButton {
+                border-radius: 10px;
+                background-color: #6B1A6F; 
+                font-size: 10px;               
+                outline: none;
+                color: white;
+            }
+            QPushButton:hover {
+                background-color: #5F0F63; 
+            }
+        """
+
+        trancar_pasta = QPushButton("Trancar pasta", page)
+        trancar_pasta.setStyleSheet(batch_button_style)
+        trancar_pasta.setFixedSize(90, 32)
+        trancar_pasta.move(575, 440)
+        trancar_pasta.clicked.connect(trancar_pasta_action)
+
+        trancar_selecao = QPushButton("Trancar seleção", page)
+        trancar_selecao.setStyleSheet(batch_button_style)
+        trancar_selecao.setFixedSize(90, 32)
+        trancar_selecao.move(675, 440)
+        trancar_selecao.clicked.connect(trancar_selecao_action)
+
+        self.add_job_status(page, 575, 480, "white")
+        # endregion
+
         # region :::::::::::Botão Página Destrancar Imagem:::::::::::
         def mudar_destrancar_action():
-            self.images_list = get_vault_images(self.vault_id) or {}
-            self.reload_work_pages()
-            self.pages.setCurrentWidget(self.unlock_image_page)
+            self.get_page("unlock").images_model.set_vault(self.vault_id)
+            self.open_page("unlock")
 
         mudar_destrancar = QPushButton("", page)
         mudar_destrancar.setStyleSheet("""
@@ -1081,32 +1383,35 @@ class MainWindow(QWidget):
         svg_widget.setParent(page)
 
         # region _____________login details_____________
-        vault_name_label = QLabel(f"Cofre: {self.vault_name}", page)
-        vault_name_label.setStyleSheet("""
+        page.vault_name_label = QLabel(f"Cofre: {self.vault_name}", page)
+        page.vault_name_label.setStyleSheet("""
             QLabel {
                 font-size: 18px;
                 color: #534858;
             }
         """)
-        vault_name_label.setFixedSize(200, 40)
-        vault_name_label.move(150, 5)
+        page.vault_name_label.setFixedSize(200, 40)
+        page.vault_name_label.move(150, 5)
 
-        last_login_label = QLabel(f"Último acesso: {self.last_login}", page)
-        last_login_label.setStyleSheet("""
+        page.last_login_label = QLabel(f"Último acesso: {format_timestamp(self.last_login)}", page)
+        page.last_login_label.setStyleSheet("""
             QLabel {
                 font-size: 10px;
                 color: #534858;
             }
         """)
-        last_login_label.setFixedSize(200, 40)
-        last_login_label.move(150, 25)
+        page.last_login_label.setFixedSize(200, 40)
+        page.last_login_label.move(150, 25)
 
         # endregion
 
         # region :::::::::::Botão "sair":::::::::::
         def sair_action():
             update_last_login(self.vault_id, self.atual_login)
-            self.pages.setCurrentWidget(self.login_page)
+            # Só cancela: a fila continua viva para o próximo login e a janela não espera pelo lote em curso
+            self.jobs.cancel_all()
+            forget_vault_key(self.vault_id)
+            self.open_page("login")
 
         sair = QPushButton("", page)
         sair.setStyleSheet("""
@@ -1131,40 +1436,31 @@ class MainWindow(QWidget):
         """)
         mudar_destrancar.setFixedSize(89, 54)
         mudar_destrancar.move(392, 63)
-        mudar_destrancar.clicked.connect(lambda: self.pages.setCurrentWidget(self.lock_image_page))
+        mudar_destrancar.clicked.connect(lambda: self.open_page("lock"))
 
         # endregion
 
         # region :::::::::::Botão "apagar"::::::::::::
-        def atualizar_lista():
-            while content_layout.count():
-                item = content_layout.takeAt(0)
-                widget = item.widget()
-                if widget:
-                    widget.deleteLater()
-
-            for imgid, imgdata in self.images_list.items():
-                item = create_image_item(imgid, imgdata, selected=False)
-                content_layout.addWidget(item)
-
-            scroll_area.setWidget(content_widget)
-
         def apagar_action():
             ids_images_selected_list = get_selected_image_ids()
-            success_count = 0
             answer = self.show_dialog("Apagar",
                                       f"Pretende eliminar permanentemente {len(ids_images_selected_list)} imagem(s)?",
                                       "",
                                       QMessageBox.Question,
                                       3)
             if answer == QMessageBox.Yes:
-                for image_id in ids_images_selected_list:
-                    result = delete_image_from_db(image_id)
-                    if result:
-                        success_count += 1
-                        del self.images_list[image_id]
-                messagebox.showinfo("Sucesso", f"{success_count} foram eliminadas com sucesso")
-                atualizar_lista()
+                images_view.clearSelection()
+                vault_id = self.vault_id
+                self.jobs.submit(
+                    f"Apagar {len(ids_images_selected_list)} imagem(s)",
+                    lambda progress_callback, cancel_event: delete_images_batch(
+                        vault_id, ids_images_selected_list, progress_callback, cancel_event),
+                    apagar_finished)
+
+        def apagar_finished(deleted_ids, failed):
+            images_model.remove_image_ids(deleted_ids)
+            if deleted_ids:
+                self.compactor.schedule()
 
         apagar = QPushButton("Apagar", page)
         apagar.setStyleSheet("""
@@ -1185,41 +1481,38 @@ class MainWindow(QWidget):
         # endregion
 
         # region :::::::::::Botão "destrancar":::::::::::
-        def save_unlocked_images(unlocked_images):
-            if len(unlocked_images) == 1:
-                file_path, _ = QFileDialog.getSaveFileName(
-                    None,
-                    "Salvar Imagem",
-                    "",
-                    "PNG Files (*.png);;All Files (*)"
-                )
-                if file_path:
-                    try:
-                        with open(file_path, "wb") as f:
-                            f.write(unlocked_images[0])
-                            messagebox.showinfo("Sucesso", "Imagem salva com sucesso")
-                    except Exception as e:
-                        messagebox.showinfo("Erro", f"Erro ao salvar a imagem: {e}")
-            elif len(unlocked_images) > 1:
-                file_path, _ = QFileDialog.getSaveFileName(
-                    None,
-                    "Salvar Imagens (ZIP)",
-                    "",
-                    "ZIP Files (*.zip);;All Files (*)"
-                )
-                if file_path:
-                    try:
-                        with zipfile.ZipFile(file_path, "w", zipfile.ZIP_DEFLATED) as zipf:
-                            for idx, img_data_v in enumerate(unlocked_images, start=1):
-                                image_filename = f"{img_data_v[0]}_{idx}.png"
-                                zipf.writestr(image_filename, img_data_v)
-
-                            messagebox.showinfo("Sucesso", "Imagens salvas com sucesso")
-                    except Exception as e:
-                        messagebox.showinfo("Erro", f"Erro ao salvar o arquivo ZIP: {e}")
+        def export_images(title, ids_images, writer_factory):
+            vault_id = self.vault_id
+
+            def unlock_work(progress_callback, cancel_event):
+                progress_callback(0, len(ids_images))
+                return unlock_images_batch(vault_id, ids_images, writer_factory(), progress_callback,
+                                           cancel_event=cancel_event)
+
+            self.jobs.submit(title, unlock_work)
+
+        def save_unlocked_image(image_id):
+            file_path, _ = QFileDialog.getSaveFileName(
+                None,
+                "Salvar Imagem",
+                "",
+                "PNG Files (*.png);;All Files (*)"
+            )
+            if file_path:
+                export_images("Destrancar imagem", [image_id], lambda: FileExportWriter(file_path))
+
+        def save_unlocked_images_zip(ids_images):
+            file_path, _ = QFileDialog.getSaveFileName(
+                None,
+                "Salvar Imagens (ZIP)",
+                "",
+                "ZIP Files (*.zip);;All Files (*)"
+            )
+            if file_path:
+                export_images(f"Destrancar {len(ids_images)} imagem(s)", ids_images,
+                              lambda: ZipExportWriter(file_path))
 
         def destrancar_action():
-            unlocked_images = []
             ids_images_selected_list = get_selected_image_ids()
             answer = self.show_dialog("Destrancar",
                                       f"Pretende destrancar {len(ids_images_selected_list)} imagem(s)?",
@@ -1227,12 +1520,10 @@ class MainWindow(QWidget):
                                       QMessageBox.Question,
                                       3)
             if answer == QMessageBox.Yes:
-                for image_id in ids_images_selected_list:
-                    unlocked_data = decode_image(image_id, self.vault_id)
-                    if unlocked_data:
-                        unlocked_images.append(unlocked_data)
-                if unlocked_images:
-                    save_unlocked_images(unlocked_images)
+                if len(ids_images_selected_list) == 1:
+                    save_unlocked_image(ids_images_selected_list[0])
+                elif len(ids_images_selected_list) > 1:
+                    save_unlocked_images_zip(ids_images_selected_list)
 
         destrancar = QPushButton("Destrancar", page)
         destrancar.setStyleSheet("""
@@ -1250,29 +1541,30 @@ class MainWindow(QWidget):
         destrancar.move(595, 360)
         destrancar.clicked.connect(destrancar_action)
 
-        # endregion
-
-        # region :::::::::::Scroll Area:::::::::::
-        scroll_area = QScrollArea(page)
-        scroll_area.setWidgetResizable(True)
-        scroll_area.setGeometry(165, 230, 350, 345)
-        scroll_area.setStyleSheet("QScrollArea { border: none; background: transparent;}")
+        self.add_job_status(page, 565, 400, "#534858")
 
-        fixed_height = 40
+        # endregion
 
-        content_widget = QWidget()
-        content_layout = QVBoxLayout(content_widget)
-        content_layout.setContentsMargins(0, 0, 0, 0)
-        content_layout.setSpacing(5)
-        content_widget.setLayout(content_layout)
-        content_widget.setStyleSheet("background: transparent; border: none;")
-        content_widget.selected_ids = set()
+        # region :::::::::::Lista de imagens:::::::::::
+        # Só as linhas visíveis são desenhadas; os metadados chegam aos poucos via fetchMore
+        images_model = VaultImageListModel(self.vault_id, self.thumbnails, page)
+        page.images_model = images_model
+        page.reset_vault_state = lambda: images_model.set_vault(self.vault_id)
+        images_view = QListView(page)
+        images_view.setModel(images_model)
+        images_view.setItemDelegate(VaultImageDelegate(images_view))
+        images_view.setUniformItemSizes(True)
+        images_view.setSelectionMode(QAbstractItemView.MultiSelection)
+        images_view.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        images_view.setGeometry(165, 230, 350, 345)
+        images_view.setStyleSheet("QListView { border: none; background: transparent; outline: none; }")
 
         def get_selected_image_ids():
-            return list(content_widget.selected_ids)
+            return [index.data(VaultImageListModel.image_id_role)
+                    for index in images_view.selectionModel().selectedIndexes()]
 
         def update_buttons():
-            if content_widget.selected_ids:
+            if images_view.selectionModel().hasSelection():
                 destrancar.setStyleSheet("""
                     QPushButton {
                         border-radius: 10px;
@@ -1311,60 +1603,70 @@ class MainWindow(QWidget):
                     }
                 """)
 
-        def create_image_item(img_id_p, img_data_p, selected=False):
-            item_widget = QWidget()
-            item_widget.setFixedHeight(fixed_height)
-            item_widget.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
-
-            item_widget.img_id = img_id_p
-
-            layout = QHBoxLayout(item_widget)
-            layout.setContentsMargins(5, 5, 5, 5)
-            layout.setSpacing(10)
-
-            label_name = QLabel(f"{img_data_p[0]}", item_widget)
-            label_name.setAlignment(Qt.AlignLeft | Qt.AlignVCenter)
-            label_name.setStyleSheet("font-size: 12px; color: #000;")
-
-            label_date = QLabel(f"{img_data_p[1]}", item_widget)
-            label_date.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
-            label_date.setStyleSheet("font-size: 10px; color: #555;")
-
-            layout.addWidget(label_name)
-            layout.addStretch()
-            layout.addWidget(label_date)
-
-            if selected:
-                item_widget.setStyleSheet("background-color: #9F81C6; border-radius: 4px;")
-            else:
-                item_widget.setStyleSheet("background-color: transparent;")
-
-            item_widget.selected = selected
-
-            def toggle_selection(event):
-                if item_widget.img_id in content_widget.selected_ids:
-                    content_widget.selected_ids.remove(item_widget.img_id)
-                    item_widget.setStyleSheet("background-color: transparent;")
-                else:
-                    content_widget.selected_ids.add(item_widget.img_id)
-                    item_widget.setStyleSheet("background-color: #9F81C6; border-radius: 4px;")
-                update_buttons()
-
-            item_widget.mousePressEvent = toggle_selection
-
-            return item_widget
-
-        if self.images_list:
-            for img_id, img_data in self.images_list.items():
-                content_layout.addWidget(create_image_item(img_id, img_data, selected=False))
-
-        scroll_area.setWidget(content_widget)
+        images_view.selectionModel().selectionChanged.connect(lambda selected, deselected: update_buttons())
+        images_model.modelReset.connect(update_buttons)
         # endregion
 
         return page
 
     ###################################################################################
 
+    def add_job_status(self, page, x, y, color):
+        # Estado da fila de tarefas na página, com um botão para cancelar tudo o que está pendente
+        status_label = QLabel("", page)
+        status_label.setStyleSheet(f"""
+            QLabel {{
+                font-size: 10px;
+                color: {color};
+            }}
+        """)
+        status_label.setFixedSize(190, 20)
+        status_label.move(x, y)
+
+        cancel_button = QPushButton("Cancelar", page)
+        cancel_button.setStyleSheet("""
+            QPushButton {
+                border-radius: 8px;
+                background-color: #8D8D8D; 
+                font-size: 9px;               
+                outline: none;
+            }
+            QPushButton:hover {
+                background-color: #5F0F63; 
+                color: white;
+            }
+        """)
+        cancel_button.setFixedSize(60, 20)
+        cancel_button.move(x, y + 22)
+        cancel_button.setVisible(self.jobs.is_busy())
+        cancel_button.clicked.connect(self.jobs.cancel_all)
+
+        def on_status_changed(status):
+            status_label.setText(status)
+            cancel_button.setVisible(bool(status))
+
+        self.jobs.status_changed.connect(on_status_changed)
+
+    def show_jobs_summary(self, results):
+        lines = []
+        first_error = None
+        for title, done, failed, cancelled in results:
+            line = f"{title}: {len(done)} concluída(s)"
+            if failed:
+                line += f", {len(failed)} falharam"
+                first_error = first_error or failed[0][1]
+            if cancelled:
+                line += " (cancelada)"
+            lines.append(line)
+        if first_error:
+            lines.append(f"\nPrimeiro erro: {first_error}")
+
+        # Não modal para a aplicação: a janela continua a responder enquanto o aviso está aberto
+        summary = QMessageBox(QMessageBox.Warning if first_error else QMessageBox.Information,
+                              "Tarefas concluídas", "\n".join(lines), QMessageBox.Ok, self)
+        summary.setAttribute(Qt.WA_DeleteOnClose)
+        summary.open()
+
     @staticmethod
     def show_dialog(title, subtitle, message, type, buttons):
         msg = QMessageBox()
@@ -1383,20 +1685,41 @@ class MainWindow(QWidget):
 
         return msg.exec()
 
+def report_startup_time():
+    # Usado por benchmarks/startup.py: imprime o tempo até a janela estar interativa e termina
+    print(f"time_to_interactive={time.perf_counter() - startup_started:.6f}", flush=True)
+    QApplication.quit()
+
 if __name__ == "__main__":
-    import multiprocessing
-    multiprocessing.freeze_support()
+    if getattr(sys, 'frozen', False):
+        multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     splash_pixmap = QPixmap(ic_splash_img)
     splash = QSplashScreen(splash_pixmap)
     splash.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint)
     splash.show()
+    app.processEvents()
+
+    def show_migration_progress(done, total):
+        # Só há migrações na primeira abertura depois de uma atualização; numa base de dados grande demoram
+        splash.showMessage(f"A atualizar a base de dados ({done} de {total})...",
+                           Qt.AlignBottom | Qt.AlignHCenter, Qt.white)
+        app.processEvents()
+
+    try:
+        open_data_dir(progress_callback=show_migration_progress)
+        search_index.open(data_path("search_index.db"))
+    except Exception as e:
+        splash.close()
+        show_message("Erro", f"Não foi possível abrir a base de dados: {str(e)}", QMessageBox.Critical)
+        sys.exit(1)
+    splash.clearMessage()
 
-    def start_main_window():
-        main_window = MainWindow()
-        main_window.show()
+    main_window = MainWindow()
+    main_window.show()
+    splash.finish(main_window)
 
-    QTimer.singleShot(1200, splash.close)
-    QTimer.singleShot(1200, start_main_window)
+    if os.environ.get("IMAGECRYPT_STARTUP_BENCHMARK"):
+        QTimer.singleShot(0, report_startup_time)
 
-    sys.exit(app.exec())
\ No newline at end of file
+    sys.exit(app.exec())
@@ -6,7 +6,9 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('bg.svg', '.'), ('bg2.svg', '.'), ('bg3.svg', '.'), ('bg2-1.png', '.'), ('bg2-2.png', '.'), ('eye0.png', '.'), ('eye1.png', '.'), ('ic_splash.png', '.'), ('Searching IC.gif', '.')],
-    hiddenimports=[],
+    # Módulos carregados só no primeiro uso (imagecrypt/lazy.py): o PyInstaller não os vê nos imports
+    hiddenimports=['PIL.Image', 'zipfile', 'difflib', 'multiprocessing',
+                   'cryptography.hazmat.primitives.ciphers.aead', 'cryptography.exceptions'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -0,0 +1,69 @@
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import time
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+
+from imagecrypt import crypto
+
+def measure_kdf(costs, r, p, runs):
+    salt = os.urandom(crypto.KDF_SALT_SIZE)
+    results = []
+    for n in costs:
+        times = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            crypto.derive_key_encryption_key("benchmark-password", salt, n, r, p)
+            times.append(time.perf_counter() - started)
+        results.append({
+            "n": n,
+            "r": r,
+            "p": p,
+            "memory_mib": 128 * r * n / (1024 * 1024),
+            "login_ms_median": statistics.median(times) * 1000,
+            "login_ms_min": min(times) * 1000,
+        })
+    return results
+
+def measure_cipher(size_mib, chunk_size, runs):
+    data_key = os.urandom(crypto.DATA_KEY_SIZE)
+    plain = os.urandom(size_mib * 1024 * 1024)
+    encrypt_times = []
+    decrypt_times = []
+
+    for _ in range(runs):
+        started = time.perf_counter()
+        sealed = b"".join(crypto.encrypt_stream(data_key, io.BytesIO(plain), len(plain), chunk_size))
+        encrypt_times.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        opened = b"".join(crypto.decrypt_stream(data_key, lambda offset, size: sealed[offset:offset + size]))
+        decrypt_times.append(time.perf_counter() - started)
+        if opened != plain:
+            raise RuntimeError("O payload decifrado não corresponde ao original")
+
+    return {
+        "size_mib": size_mib,
+        "chunk_size": chunk_size,
+        "encrypt_mb_s": size_mib / statistics.median(encrypt_times),
+        "decrypt_mb_s": size_mib / statistics.median(decrypt_times),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mede o custo do KDF no login e o débito da cifra dos payloads.")
+    parser.add_argument("--kdf-n", type=int, nargs="+", default=[2 ** 14, 2 ** 15, 2 ** 16, 2 ** 17])
+    parser.add_argument("--kdf-r", type=int, default=crypto.KDF_R)
+    parser.add_argument("--kdf-p", type=int, default=crypto.KDF_P)
+    parser.add_argument("--size-mib", type=int, default=64)
+    parser.add_argument("--chunk-size", type=int, default=crypto.STREAM_CHUNK_SIZE)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    print(json.dumps({
+        "kdf": measure_kdf(args.kdf_n, args.kdf_r, args.kdf_p, args.runs),
+        "cipher": measure_cipher(args.size_mib, args.chunk_size, args.runs),
+    }, indent=2))
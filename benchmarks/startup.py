@@ -0,0 +1,42 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+app_script = os.path.join(repo_dir, "ImageCrypt.py")
+
+def measure_startup(runs):
+    env = dict(os.environ, IMAGECRYPT_STARTUP_BENCHMARK="1")
+    wall_times = []
+    interactive_times = []
+
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, app_script], cwd=repo_dir, env=env,
+                                capture_output=True, text=True, timeout=60)
+        wall_times.append(time.perf_counter() - started)
+
+        for line in result.stdout.splitlines():
+            if line.startswith("time_to_interactive="):
+                interactive_times.append(float(line.split("=", 1)[1]))
+                break
+        else:
+            raise RuntimeError(f"A aplicação não reportou o arranque:\n{result.stderr}")
+
+    return {
+        "runs": runs,
+        "time_to_interactive_median": statistics.median(interactive_times),
+        "time_to_interactive_min": min(interactive_times),
+        "process_wall_median": statistics.median(wall_times),
+        "process_wall_min": min(wall_times),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mede o tempo de arranque do ImageCrypt até a janela estar interativa.")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(measure_startup(args.runs), indent=2))
@@ -0,0 +1,380 @@
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+
+from PIL import Image
+
+from imagecrypt import storage, vault
+from imagecrypt.search import PathSearcher, search_index
+
+try:
+    import resource
+except ImportError:  # Windows: sem getrusage, o pico de memória fica por medir
+    resource = None
+
+VAULT_NAME = "benchmark"
+VAULT_PASSWORD = "benchmark-password"
+
+# (proporção, dimensões): a maior parte são imagens pequenas, com algumas fotografias grandes
+IMAGE_SIZE_MIX = [
+    (0.70, (640, 480)),
+    (0.25, (1600, 1200)),
+    (0.05, (4000, 3000)),
+]
+FILES_PER_DIR = 100
+NAME_WORDS = ["praia", "familia", "ferias", "natal", "aniversario", "casamento", "viagem", "escola",
+              "montanha", "cidade", "jardim", "festa", "retrato", "paisagem", "noite", "verao"]
+LIST_PAGE_SIZE = 200  # o mesmo tamanho de página que a grelha do desbloqueio pede
+
+def make_templates(seed):
+    # Um JPEG por classe de tamanho; cada ficheiro da árvore é um destes com um sufixo único,
+    # para que a deduplicação por conteúdo não esconda o custo de cifrar
+    rng = random.Random(seed)
+    templates = []
+    for _, (width, height) in IMAGE_SIZE_MIX:
+        noise = Image.frombytes("RGB", (width // 8, height // 8), rng.randbytes(width // 8 * height // 8 * 3))
+        buffer = io.BytesIO()
+        noise.resize((width, height), Image.BICUBIC).save(buffer, "JPEG", quality=90)
+        templates.append(buffer.getvalue())
+    return templates
+
+def image_name(rng, index):
+    pattern = rng.randrange(3)
+    if pattern == 0:
+        return f"IMG_{index:06d}"
+    if pattern == 1:
+        return f"DSC{index:06d}"
+    return f"{rng.choice(NAME_WORDS)}_{rng.choice(NAME_WORDS)}_{index:06d}"
+
+def write_images(directory, count, templates, rng, nested, first_index=0):
+    weights = [share for share, _ in IMAGE_SIZE_MIX]
+    paths = []
+    total_bytes = 0
+    for offset in range(count):
+        index = first_index + offset
+        if nested:
+            folder = index // FILES_PER_DIR
+            image_dir = os.path.join(directory, f"album_{folder // 10:04d}", f"parte_{folder % 10:02d}")
+        else:
+            image_dir = directory
+        os.makedirs(image_dir, exist_ok=True)
+        path = os.path.join(image_dir, image_name(rng, index) + ".jpg")
+        # Bytes depois do marcador de fim do JPEG: os descodificadores ignoram-nos
+        data = rng.choices(templates, weights)[0] + index.to_bytes(8, "little")
+        with open(path, "wb") as f:
+            f.write(data)
+        paths.append(path)
+        total_bytes += len(data)
+    return paths, total_bytes
+
+def make_queries(paths, count, rng):
+    names = [os.path.splitext(os.path.basename(path))[0] for path in rng.sample(paths, min(count, len(paths)))]
+    queries = []
+    for n, name in enumerate(names):
+        if n % 2:
+            # Metade das consultas com duas letras trocadas, como quem escreve à pressa
+            position = rng.randrange(len(name) - 1)
+            name = name[:position] + name[position + 1] + name[position] + name[position + 2:]
+        queries.append(name)
+    return queries
+
+def latency_stats(times):
+    if not times:
+        return None
+    ms = sorted(t * 1000 for t in times)
+    if len(ms) == 1:
+        return {"p50": ms[0], "p90": ms[0], "p99": ms[0], "max": ms[0]}
+    cuts = statistics.quantiles(ms, n=100, method="inclusive")
+    return {"p50": cuts[49], "p90": cuts[89], "p99": cuts[98], "max": ms[-1]}
+
+def peak_rss_mib(who):
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss vem em KiB no Linux e em bytes no macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+class DiscardExportWriter:
+    # Consome o conteúdo decifrado sem escrever no disco: mede-se a decifra, não o disco de destino
+    def __init__(self):
+        self.bytes_written = 0
+
+    def write(self, entry_name, chunks, compressible=True):
+        for chunk in chunks:
+            self.bytes_written += len(chunk)
+
+    def close(self):
+        pass
+
+def run_lock(vault_id, params):
+    started = time.perf_counter()
+    locked, failed = vault.lock_images_batch(vault_id, params["tree_paths"], max_workers=params["workers"])
+    seconds = time.perf_counter() - started
+    if failed:
+        raise RuntimeError(f"{len(failed)} imagem(s) falharam ao trancar: {failed[0]}")
+
+    # Latência por imagem: trancar uma a uma, como no arrastar de ficheiros isolados
+    times = []
+    for path in params["sample_paths"]:
+        started_one = time.perf_counter()
+        vault.encode_image(vault_id, path)
+        times.append(time.perf_counter() - started_one)
+    return {"items": len(locked), "seconds": seconds, "bytes": params["tree_bytes"], "latencies": times}
+
+def run_unlock(vault_id, params):
+    image_ids = [img_id for img_id, _, _ in iter_vault_images(vault_id)]
+    writer = DiscardExportWriter()
+    started = time.perf_counter()
+    exported, failed = vault.unlock_images_batch(vault_id, image_ids, writer, max_workers=params["workers"])
+    seconds = time.perf_counter() - started
+    if failed:
+        raise RuntimeError(f"{len(failed)} imagem(s) falharam ao exportar: {failed[0]}")
+
+    times = []
+    for img_id in random.Random(params["seed"]).sample(image_ids, min(params["latency_samples"], len(image_ids))):
+        started_one = time.perf_counter()
+        vault.decode_image_bytes(vault_id, img_id)
+        times.append(time.perf_counter() - started_one)
+    return {"items": len(exported), "seconds": seconds, "bytes": writer.bytes_written, "latencies": times}
+
+def iter_vault_images(vault_id, page_times=None):
+    after = None
+    while True:
+        started = time.perf_counter()
+        page = vault.get_vault_images_page(vault_id, after, LIST_PAGE_SIZE)
+        if page_times is not None:
+            page_times.append(time.perf_counter() - started)
+        yield from page
+        if len(page) < LIST_PAGE_SIZE:
+            break
+        after = (page[-1][2], page[-1][0])
+
+def run_list(vault_id, params):
+    # Latência por página (o que a grelha espera ao fazer scroll) e o tempo de percorrer o cofre todo
+    page_times = []
+    started = time.perf_counter()
+    items = sum(1 for _ in iter_vault_images(vault_id, page_times))
+    seconds = time.perf_counter() - started
+    return {"items": items, "seconds": seconds, "bytes": None, "latencies": page_times}
+
+def run_queries(queries, roots):
+    times = []
+    started = time.perf_counter()
+    for query in queries:
+        started_one = time.perf_counter()
+        PathSearcher(query, roots=roots)
+        times.append(time.perf_counter() - started_one)
+    return time.perf_counter() - started, times
+
+def run_search_crawl(vault_id, params):
+    # O índice não é aberto neste processo: cada consulta percorre a árvore
+    seconds, times = run_queries(params["queries"], [params["tree_dir"]])
+    return {"items": len(times), "seconds": seconds, "bytes": None, "latencies": times}
+
+def run_search_index(vault_id, params):
+    search_index.open(storage.data_path("search_index.db"))
+    started = time.perf_counter()
+    search_index.refresh([params["tree_dir"]])
+    build_seconds = time.perf_counter() - started
+    seconds, times = run_queries(params["queries"], [params["tree_dir"]])
+    return {"items": len(times), "seconds": seconds, "bytes": None, "latencies": times,
+            "index_build_seconds": build_seconds}
+
+OPERATIONS = {
+    "lock": run_lock,
+    "list": run_list,
+    "unlock": run_unlock,
+    "search_crawl": run_search_crawl,
+    "search_index": run_search_index,
+}
+
+def operation_process(conn, operation, data_dir, params):
+    try:
+        storage.open_data_dir(data_dir)
+        vault_id = vault.login_vault(VAULT_NAME, VAULT_PASSWORD)[0]
+        result = OPERATIONS[operation](vault_id, params)
+        vault.forget_vault_key(vault_id)
+        result["peak_rss_mib"] = peak_rss_mib(resource.RUSAGE_SELF) if resource else None
+        # Os processos de cifra do lote contam à parte
+        result["workers_peak_rss_mib"] = peak_rss_mib(resource.RUSAGE_CHILDREN) if resource else None
+        conn.send(("ok", result))
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+def run_isolated(operation, data_dir, params):
+    # Cada operação corre num processo novo, para que o pico de memória seja só dela
+    context = multiprocessing.get_context("spawn")
+    parent_conn, child_conn = context.Pipe(duplex=False)
+    process = context.Process(target=operation_process, args=(child_conn, operation, data_dir, params))
+    process.start()
+    child_conn.close()
+    status, result = parent_conn.recv()
+    process.join()
+    if status != "ok":
+        raise RuntimeError(f"A operação {operation} falhou: {result}")
+    return result
+
+def summarize(scale, operation, result):
+    seconds = result["seconds"]
+    summary = {
+        "scale": scale,
+        "operation": operation,
+        "items": result["items"],
+        "seconds": seconds,
+        "items_per_s": result["items"] / seconds if seconds else None,
+        "mib_per_s": result["bytes"] / (1024 * 1024) / seconds if result["bytes"] and seconds else None,
+        "latency_ms": latency_stats(result["latencies"]),
+        "latency_samples": len(result["latencies"]),
+        "peak_rss_mib": result["peak_rss_mib"],
+        "workers_peak_rss_mib": result["workers_peak_rss_mib"],
+    }
+    if "index_build_seconds" in result:
+        summary["index_build_seconds"] = result["index_build_seconds"]
+    return summary
+
+def measure_scale(scale, work_dir, templates, args):
+    rng = random.Random(args.seed + scale)
+    scale_dir = os.path.join(work_dir, f"scale-{scale}")
+    data_dir = os.path.join(scale_dir, "data")
+    tree_dir = os.path.join(scale_dir, "tree")
+
+    started = time.perf_counter()
+    tree_paths, tree_bytes = write_images(tree_dir, scale, templates, rng, nested=True)
+    # As amostras de latência ficam fora da árvore: não entram na pesquisa nem repetem conteúdo do lote
+    sample_paths, _ = write_images(os.path.join(scale_dir, "samples"), args.latency_samples, templates, rng,
+                                   nested=False, first_index=scale)
+    print(f"[{scale}] árvore sintética: {tree_bytes / (1024 * 1024):.0f} MiB em "
+          f"{time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    storage.open_data_dir(data_dir)
+    vault.create_vault(VAULT_PASSWORD, VAULT_NAME)
+    storage.database.close()
+
+    params = {
+        "seed": args.seed,
+        "workers": args.workers,
+        "latency_samples": args.latency_samples,
+        "tree_dir": tree_dir,
+        "tree_paths": tree_paths,
+        "tree_bytes": tree_bytes,
+        "sample_paths": sample_paths,
+        "queries": make_queries(tree_paths, args.queries, rng),
+    }
+    results = []
+    # Ordem fixa, seja qual for a da linha de comando: listar e desbloquear precisam do cofre já trancado
+    for operation in OPERATIONS:
+        if operation not in args.operations:
+            continue
+        print(f"[{scale}] {operation}...", file=sys.stderr)
+        results.append(summarize(scale, operation, run_isolated(operation, data_dir, params)))
+
+    if not args.keep:
+        shutil.rmtree(scale_dir, ignore_errors=True)
+    return {"scale": scale, "tree_mib": tree_bytes / (1024 * 1024), "results": results}
+
+def measure_startup(runs, data_dir):
+    # Reutiliza benchmarks/startup.py, com a aplicação a apontar para uma pasta de dados descartável
+    import startup
+    previous = os.environ.get("IMAGECRYPT_DATA_DIR")
+    os.environ["IMAGECRYPT_DATA_DIR"] = data_dir
+    try:
+        return startup.measure_startup(runs)
+    finally:
+        if previous is None:
+            del os.environ["IMAGECRYPT_DATA_DIR"]
+        else:
+            os.environ["IMAGECRYPT_DATA_DIR"] = previous
+
+def current_commit():
+    try:
+        result = subprocess.run(["git", "rev-parse", "HEAD"], cwd=repo_dir, capture_output=True, text=True)
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+def compare(baseline, current):
+    # Razões atual/base: débito acima de 1 é melhor, latência e memória abaixo de 1 são melhores
+    previous = {(r["scale"], r["operation"]): r for s in baseline["scales"] for r in s["results"]}
+    lines = [f"{'escala':>7} {'operação':<13} {'débito':>8} {'p50':>8} {'p99':>8} {'memória':>8}"]
+
+    def ratio(new, old):
+        return f"{new / old:8.2f}" if new and old else f"{'-':>8}"
+
+    for scale in current["scales"]:
+        for r in scale["results"]:
+            old = previous.get((r["scale"], r["operation"]))
+            if not old:
+                continue
+            new_latency = r["latency_ms"] or {}
+            old_latency = old["latency_ms"] or {}
+            lines.append(f"{r['scale']:>7} {r['operation']:<13} {ratio(r['items_per_s'], old['items_per_s'])} "
+                         f"{ratio(new_latency.get('p50'), old_latency.get('p50'))} "
+                         f"{ratio(new_latency.get('p99'), old_latency.get('p99'))} "
+                         f"{ratio(r['peak_rss_mib'], old['peak_rss_mib'])}")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Mede trancar, desbloquear, listar, pesquisar e arrancar sobre cofres e árvores de imagens "
+                    "sintéticas, com débito, percentis de latência e pico de memória por operação.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1000],
+                        help="Número de imagens por cofre (por exemplo 1000 10000 100000)")
+    parser.add_argument("--operations", nargs="+", choices=list(OPERATIONS) + ["startup"],
+                        default=list(OPERATIONS) + ["startup"])
+    parser.add_argument("--workers", type=int, default=None, help="Processos a cifrar (por omissão, um por CPU)")
+    parser.add_argument("--latency-samples", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--startup-runs", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--work-dir", default=None, help="Pasta para os cofres e árvores (por omissão, uma pasta temporária)")
+    parser.add_argument("--keep", action="store_true", help="Não apaga os cofres e árvores gerados")
+    parser.add_argument("--output", default=None, help="Escreve o JSON neste ficheiro além do stdout")
+    parser.add_argument("--baseline", default=None, help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="imagecrypt-bench-")
+    os.makedirs(work_dir, exist_ok=True)
+    templates = make_templates(args.seed)
+    report = {
+        "commit": current_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "parameters": {
+            "seed": args.seed,
+            "workers": args.workers,
+            "latency_samples": args.latency_samples,
+            "queries": args.queries,
+            "image_size_mix": [{"share": share, "width": width, "height": height}
+                               for share, (width, height) in IMAGE_SIZE_MIX],
+        },
+        "scales": [measure_scale(scale, work_dir, templates, args) for scale in args.scales],
+    }
+    if "startup" in args.operations and args.startup_runs:
+        report["startup"] = measure_startup(args.startup_runs, os.path.join(work_dir, "startup-data"))
+    if not args.work_dir and not args.keep:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    if args.baseline:
+        with open(args.baseline) as f:
+            print(compare(json.load(f), report), file=sys.stderr)
@@ -0,0 +1,60 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+
+from imagecrypt import storage
+
+def measure_wipe(directory, size_mib, files, passes, block_size, rate_limit, runs):
+    times = []
+    for _ in range(runs):
+        paths = []
+        for index in range(files):
+            path = os.path.join(directory, f"wipe-{index}.bin")
+            with open(path, "wb") as file:
+                file.write(os.urandom(size_mib * 1024 * 1024))
+            paths.append(path)
+
+        rate_limiter = storage.RateLimiter(rate_limit) if rate_limit else None
+        started = time.perf_counter()
+        for path in paths:
+            storage.wipe_file(path, passes, block_size, rate_limiter)
+        times.append(time.perf_counter() - started)
+
+    # Débito efetivo: bytes escritos em todas as passagens a dividir pelo tempo total, fsync incluído.
+    # Sem passagens nada é escrito: só o ritmo de unlink tem significado.
+    written_mib = size_mib * files * passes
+    return {
+        "passes": passes,
+        "block_size": block_size,
+        "rate_limit": rate_limit,
+        "files": files,
+        "file_size_mib": size_mib,
+        "wipe_mb_s": written_mib / statistics.median(times) if passes else None,
+        "files_per_s": files / statistics.median(times),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mede o débito da limpeza dos originais (sobrescrita, fsync e unlink).")
+    parser.add_argument("--dir", default=None, help="Pasta no disco a medir (por omissão, uma pasta temporária)")
+    parser.add_argument("--size-mib", type=int, default=8)
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--passes", type=int, nargs="+", default=[1, 3])
+    parser.add_argument("--block-size", type=int, nargs="+",
+                        default=[64 * 1024, 1024 * 1024, 4 * 1024 * 1024])
+    parser.add_argument("--rate-limit", type=int, default=None, help="Bytes por segundo (por omissão, sem limite)")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="imagecrypt-wipe-", dir=args.dir) as directory:
+        print(json.dumps([
+            measure_wipe(directory, args.size_mib, args.files, passes, block_size, args.rate_limit, args.runs)
+            for passes in args.passes
+            for block_size in args.block_size
+        ], indent=2))
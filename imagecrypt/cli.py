@@ -0,0 +1,174 @@
+import argparse
+import getpass
+import os
+import sys
+
+from .storage import open_data_dir, compact_database, wipe_file, WIPE_PASSES
+from .search import (PathSearcher, SEARCH_ROOTS, SEARCH_MATCHERS, SEARCH_MATCHER, SEARCH_MAX_RESULTS,
+                     SEARCH_SIMILARITY_THRESHOLD)
+from .vault import (create_vault, login_vault, verify_if_vault_name_exists, forget_vault_key, update_last_login,
+                    format_timestamp, get_vault_images_page, list_folder_images, lock_images_batch,
+                    unlock_images_batch, delete_images_batch, ZipExportWriter, DirectoryExportWriter)
+
+def print_progress(done, total):
+    # Só desenha o progresso num terminal: em tarefas agendadas o stderr fica limpo para os erros
+    if sys.stderr.isatty():
+        sys.stderr.write(f"\r{done} de {total}")
+        if done == total:
+            sys.stderr.write("\n")
+        sys.stderr.flush()
+
+def report_failures(failed):
+    for item, error in failed:
+        print(f"Falhou {item}: {error}", file=sys.stderr)
+    return 1 if failed else 0
+
+def read_password(args, prompt="Senha do cofre: "):
+    if args.password_env:
+        password = os.environ.get(args.password_env)
+        if password is None:
+            raise SystemExit(f"A variável de ambiente {args.password_env} não está definida.")
+        return password
+    return getpass.getpass(prompt)
+
+def open_vault(args):
+    if not args.vault:
+        raise SystemExit("Indique o cofre com --vault ou IMAGECRYPT_VAULT.")
+    vault = login_vault(args.vault, read_password(args))
+    if not vault:
+        raise SystemExit("Senha de acesso incorreta ou cofre inexistente.")
+    vault_id, _, _, atual_login = vault
+    update_last_login(vault_id, atual_login)
+    return vault_id
+
+def command_create(args):
+    if not args.vault:
+        raise SystemExit("Indique o nome do novo cofre com --vault ou IMAGECRYPT_VAULT.")
+    if verify_if_vault_name_exists(args.vault):
+        raise SystemExit("Já existe um cofre com o mesmo nome.")
+    password = read_password(args, "Nova senha do cofre: ")
+    if not args.password_env and getpass.getpass("Repita a senha: ") != password:
+        raise SystemExit("As senhas não coincidem.")
+    if len(password) < 8:
+        raise SystemExit("A senha deve conter pelo menos 8 caracteres.")
+    vault_id = create_vault(password, args.vault)
+    print(vault_id)
+    return 0
+
+def command_lock(args):
+    vault_id = open_vault(args)
+    image_paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            image_paths.extend(list_folder_images(path))
+        else:
+            image_paths.append(path)
+
+    try:
+        locked, failed = lock_images_batch(vault_id, image_paths, print_progress, max_workers=args.workers)
+        if args.remove_originals:
+            # Sem limite de débito: numa tarefa agendada não há interface a disputar o disco
+            for image_path in locked:
+                try:
+                    wipe_file(image_path, args.wipe_passes)
+                except OSError as e:
+                    failed.append((image_path, str(e)))
+    finally:
+        forget_vault_key(vault_id)
+    print(f"{len(locked)} imagem(s) trancada(s)")
+    return report_failures(failed)
+
+def command_unlock(args):
+    vault_id = open_vault(args)
+    try:
+        image_ids = args.ids or [img_id for img_id, _, _ in iter_vault_images(vault_id)]
+        if args.out.lower().endswith(".zip"):
+            writer = ZipExportWriter(args.out)
+        else:
+            writer = DirectoryExportWriter(args.out)
+        exported, failed = unlock_images_batch(vault_id, image_ids, writer, print_progress, max_workers=args.workers)
+    finally:
+        forget_vault_key(vault_id)
+    print(f"{len(exported)} imagem(s) exportada(s) para {args.out}")
+    return report_failures(failed)
+
+def iter_vault_images(vault_id):
+    after = None
+    while True:
+        page = get_vault_images_page(vault_id, after, 1000)
+        yield from page
+        if len(page) < 1000:
+            break
+        after = (page[-1][2], page[-1][0])
+
+def command_ls(args):
+    vault_id = open_vault(args)
+    forget_vault_key(vault_id)
+    for img_id, image_name, created_at in iter_vault_images(vault_id):
+        print(f"{img_id}\t{format_timestamp(created_at)}\t{image_name}")
+    return 0
+
+def command_rm(args):
+    vault_id = open_vault(args)
+    forget_vault_key(vault_id)
+    # Só apaga imagens do cofre indicado, mesmo que os ids pertençam a outro
+    deleted, failed = delete_images_batch(vault_id, args.ids, print_progress)
+    # Sem interface à espera, a compactação corre logo e sem pausas entre passos
+    compact_database(pause=0)
+    print(f"{len(deleted)} imagem(s) apagada(s)")
+    return report_failures(failed)
+
+def command_search(args):
+    searcher = PathSearcher(args.name, matcher=args.matcher, threshold=args.threshold,
+                            max_results=args.max_results, roots=args.root or SEARCH_ROOTS)
+    for path in searcher.get_paths():
+        print(path)
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="imagecrypt", description="Operações em lote sobre os cofres do ImageCrypt, sem interface gráfica.")
+    parser.add_argument("--data-dir", default=None,
+                        help="Pasta com a base de dados (por omissão IMAGECRYPT_DATA_DIR ou a pasta da aplicação)")
+    parser.add_argument("--vault", default=os.environ.get("IMAGECRYPT_VAULT"), help="Nome do cofre")
+    parser.add_argument("--password-env", default=None,
+                        help="Lê a senha desta variável de ambiente em vez de a pedir no terminal")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    create = commands.add_parser("create", help="Cria um cofre novo")
+    create.set_defaults(handler=command_create)
+
+    lock = commands.add_parser("lock", help="Tranca imagens ou pastas (percorridas recursivamente)")
+    lock.add_argument("paths", nargs="+")
+    lock.add_argument("--workers", type=int, default=None, help="Processos a cifrar (por omissão, um por CPU)")
+    lock.add_argument("--remove-originals", action="store_true", help="Apaga os originais depois de trancados")
+    lock.add_argument("--wipe-passes", type=int, default=WIPE_PASSES,
+                      help="Passagens de sobrescrita antes de apagar os originais (0 = apenas apagar)")
+    lock.set_defaults(handler=command_lock)
+
+    unlock = commands.add_parser("unlock", help="Exporta imagens para um ZIP ou para uma pasta")
+    unlock.add_argument("--ids", type=int, nargs="+", default=None, help="Por omissão, todas as imagens do cofre")
+    unlock.add_argument("--out", required=True, help="Ficheiro .zip ou pasta de destino")
+    unlock.add_argument("--workers", type=int, default=None)
+    unlock.set_defaults(handler=command_unlock)
+
+    ls = commands.add_parser("ls", help="Lista as imagens do cofre (id, data, nome)")
+    ls.set_defaults(handler=command_ls)
+
+    rm = commands.add_parser("rm", help="Apaga imagens do cofre")
+    rm.add_argument("--ids", type=int, nargs="+", required=True)
+    rm.set_defaults(handler=command_rm)
+
+    search = commands.add_parser("search", help="Procura imagens no disco pelo nome")
+    search.add_argument("name")
+    search.add_argument("--root", action="append", default=None, help="Pasta onde procurar (pode repetir)")
+    search.add_argument("--matcher", choices=sorted(SEARCH_MATCHERS), default=SEARCH_MATCHER)
+    search.add_argument("--threshold", type=float, default=SEARCH_SIMILARITY_THRESHOLD)
+    search.add_argument("--max-results", type=int, default=SEARCH_MAX_RESULTS)
+    search.set_defaults(handler=command_search)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command != "search":
+        open_data_dir(args.data_dir)
+    return args.handler(args)
@@ -0,0 +1,122 @@
+import hashlib
+import os
+import struct
+
+from .lazy import aead, crypto_exceptions
+
+def hash_password(password):
+    # sha256 sem sal dos cofres antigos; só serve para verificar a senha antes de o cofre ser selado
+    return hashlib.sha256(password.encode()).hexdigest()
+
+# Formato do payload cifrado: cabeçalho (magic, tamanho do bloco, tamanho original)
+# seguido de blocos AES-GCM independentes, cada um com o seu nonce e tag.
+STREAM_MAGIC = b"ICS1"
+STREAM_HEADER = struct.Struct(">4sIQ")
+STREAM_CHUNK_SIZE = 1024 * 1024
+STREAM_CHUNK_AAD = struct.Struct(">Q?")
+NONCE_SIZE = 12
+TAG_SIZE = 16
+
+def derive_vault_data_key(encryption_key):
+    # Só para cofres antigos, cuja chave ainda está em claro em vault.encryption_key
+    return hashlib.sha256(encryption_key.encode()).digest()
+
+# Custo do scrypt para cofres novos (e para os antigos, no login seguinte a uma alteração).
+# N=2**15, r=8 usa 32 MiB e demora na ordem de 100 ms; benchmarks/crypto.py mede outras combinações.
+KDF_N = 2 ** 15
+KDF_R = 8
+KDF_P = 1
+KDF_SALT_SIZE = 16
+DATA_KEY_SIZE = 32
+WRAPPED_KEY_MAGIC = b"ICVault1"
+WRAPPED_KEY_AAD = struct.Struct(">8sQ")
+
+
+def derive_key_encryption_key(password, salt, n=KDF_N, r=KDF_R, p=KDF_P):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=128 * r * (n + p + 2) + 1024 * 1024, dklen=DATA_KEY_SIZE)
+
+def wrap_data_key(key_encryption_key, vault_id, data_key):
+    nonce = os.urandom(NONCE_SIZE)
+    aad = WRAPPED_KEY_AAD.pack(WRAPPED_KEY_MAGIC, vault_id)
+    return nonce + aead.AESGCM(key_encryption_key).encrypt(nonce, data_key, aad)
+
+def unwrap_data_key(key_encryption_key, vault_id, wrapped_key):
+    # Uma senha errada dá outra chave e a tag GCM falha: é esta a verificação da senha
+    aad = WRAPPED_KEY_AAD.pack(WRAPPED_KEY_MAGIC, vault_id)
+    try:
+        return aead.AESGCM(key_encryption_key).decrypt(wrapped_key[:NONCE_SIZE], wrapped_key[NONCE_SIZE:], aad)
+    except crypto_exceptions.InvalidTag:
+        return None
+
+def encrypted_stream_size(plain_size, chunk_size=STREAM_CHUNK_SIZE):
+    chunks = max(1, -(-plain_size // chunk_size))
+    return STREAM_HEADER.size + chunks * (NONCE_SIZE + TAG_SIZE) + plain_size
+
+def new_content_hash(data_key):
+    # Hash com chave do cofre: identifica duplicados sem expor a impressão digital da imagem em claro
+    return hashlib.blake2b(digest_size=32, key=data_key, person=b"ImageCryptDedup")
+
+def encrypt_stream(data_key, src_file, plain_size, chunk_size=STREAM_CHUNK_SIZE, content_hash=None):
+    cipher = aead.AESGCM(data_key)
+    header = STREAM_HEADER.pack(STREAM_MAGIC, chunk_size, plain_size)
+    yield header
+
+    remaining = plain_size
+    index = 0
+    while True:
+        expected = min(chunk_size, remaining)
+        chunk = src_file.read(expected)
+        if len(chunk) != expected:
+            raise ValueError("O ficheiro foi alterado durante a leitura")
+        remaining -= expected
+        if content_hash:
+            content_hash.update(chunk)
+        nonce = os.urandom(NONCE_SIZE)
+        # O índice e a marca de último bloco impedem reordenar ou truncar o payload
+        aad = header + STREAM_CHUNK_AAD.pack(index, remaining == 0)
+        yield nonce + cipher.encrypt(nonce, chunk, aad)
+        index += 1
+        if remaining == 0:
+            break
+
+    if src_file.read(1):
+        raise ValueError("O ficheiro foi alterado durante a leitura")
+
+def decrypt_stream(data_key, read_at):
+    cipher = aead.AESGCM(data_key)
+    header = read_at(0, STREAM_HEADER.size)
+    magic, chunk_size, plain_size = STREAM_HEADER.unpack(header)
+    if magic != STREAM_MAGIC:
+        raise ValueError("Formato de imagem desconhecido")
+
+    offset = STREAM_HEADER.size
+    remaining = plain_size
+    index = 0
+    while True:
+        expected = min(chunk_size, remaining)
+        sealed = read_at(offset, NONCE_SIZE + expected + TAG_SIZE)
+        offset += len(sealed)
+        remaining -= expected
+        aad = header + STREAM_CHUNK_AAD.pack(index, remaining == 0)
+        yield cipher.decrypt(sealed[:NONCE_SIZE], sealed[NONCE_SIZE:], aad)
+        index += 1
+        if remaining == 0:
+            break
+
+THUMBNAIL_AAD = struct.Struct(">8sQ")
+THUMBNAIL_MAGIC = b"ICThumb1"
+
+def encrypt_thumbnail(data_key, payload_id, thumbnail):
+    # O id do payload entra no AAD: uma miniatura não pode ser trocada pela de outra imagem
+    nonce = os.urandom(NONCE_SIZE)
+    aad = THUMBNAIL_AAD.pack(THUMBNAIL_MAGIC, payload_id)
+    return nonce + aead.AESGCM(data_key).encrypt(nonce, thumbnail, aad)
+
+def decrypt_thumbnail(data_key, payload_id, sealed):
+    aad = THUMBNAIL_AAD.pack(THUMBNAIL_MAGIC, payload_id)
+    return aead.AESGCM(data_key).decrypt(sealed[:NONCE_SIZE], sealed[NONCE_SIZE:], aad)
+
+def random_block(size):
+    # Cifrar zeros com uma chave descartável dá bytes aleatórios bem mais depressa do que os.urandom
+    return aead.AESGCM(os.urandom(DATA_KEY_SIZE)).encrypt(os.urandom(NONCE_SIZE), bytes(size), None)[:size]
@@ -0,0 +1,20 @@
+import importlib
+
+class LazyImport:
+    # Adia o import de módulos pesados até ao primeiro uso, para a janela abrir mais cedo
+    def __init__(self, module_name):
+        self._module_name = module_name
+        self._module = None
+
+    def __getattr__(self, name):
+        if self._module is None:
+            self._module = importlib.import_module(self._module_name)
+        return getattr(self._module, name)
+
+# Qualquer módulo novo aqui tem de entrar também em hiddenimports no ImageCrypt.spec
+PILImage = LazyImport("PIL.Image")
+zipfile = LazyImport("zipfile")
+difflib = LazyImport("difflib")
+multiprocessing = LazyImport("multiprocessing")
+aead = LazyImport("cryptography.hazmat.primitives.ciphers.aead")
+crypto_exceptions = LazyImport("cryptography.exceptions")
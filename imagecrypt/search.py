@@ -0,0 +1,488 @@
+import os
+import heapq
+import math
+import threading
+import time
+from collections import deque, Counter
+
+from .lazy import difflib
+from .storage import Database, IMAGE_EXTENSIONS
+
+SEARCH_ROOTS = [
+    os.path.expanduser("~/Desktop"),
+    os.path.expanduser("~/Pictures"),
+    os.path.expanduser("~/Documents"),
+    os.path.expanduser("~/Photos"),
+    os.path.expanduser("~/Downloads")
+]
+# Nomes de pastas (em minúsculas) que a pesquisa e o índice nunca percorrem
+SEARCH_EXCLUDED_DIRS = {"$recycle.bin", "appdata", "node_modules", "__pycache__", ".git", ".cache"}
+SEARCH_MAX_DEPTH = None  # None percorre toda a árvore; 0 lê só as próprias raízes
+SEARCH_CRAWL_THREADS = 8
+
+def is_excluded_dir(entry, excluded_dirs=SEARCH_EXCLUDED_DIRS):
+    return entry.name.lower() in excluded_dirs
+
+SEARCH_SIMILARITY_THRESHOLD = 0.5
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class RatioMatcher:
+    # Dá o mesmo resultado que SequenceMatcher.ratio(), mas descarta primeiro, com limites baratos,
+    # os nomes que nunca poderiam passar o limiar
+    # Com o índice, a pesquisa pára quando os trigramas por ler já não chegariam para passar o limiar
+    # do top-K; é exato para TrigramMatcher e uma aproximação aqui (a pesquisa nas pastas compara todos)
+    def __init__(self, query, threshold=SEARCH_SIMILARITY_THRESHOLD):
+        self.query = query
+        self.query_trigrams = trigrams(query)
+        self.threshold = threshold
+        self.query_counts = Counter(query)
+        # A análise do lado b (a pesquisa) é feita uma única vez e reutilizada para todos os nomes
+        self.sequence_matcher = difflib.SequenceMatcher(None)
+        self.sequence_matcher.set_seq2(query)
+
+    def score(self, name, threshold=None):
+        # threshold permite subir o limiar durante a pesquisa (ex.: pior resultado do top-K atual)
+        threshold = self.threshold if threshold is None else threshold
+        total = len(name) + len(self.query)
+        if not total:
+            return None
+        # ratio = 2 * M / total, e M nunca excede o menor comprimento nem os caracteres em comum
+        if 2 * min(len(name), len(self.query)) <= threshold * total:
+            return None
+        query_counts = self.query_counts
+        common = sum(min(count, query_counts[char]) for char, count in Counter(name).items() if char in query_counts)
+        if 2 * common <= threshold * total:
+            return None
+        self.sequence_matcher.set_seq1(name)
+        ratio = self.sequence_matcher.ratio()
+        return ratio if ratio > threshold else None
+
+class TrigramMatcher:
+    # Coeficiente de Dice sobre trigramas: mais rápido e tolerante a palavras trocadas de ordem
+    def __init__(self, query, threshold=SEARCH_SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self.query_trigrams = self.trigrams(query)
+
+    trigrams = staticmethod(trigrams)
+
+    def score(self, name, threshold=None):
+        threshold = self.threshold if threshold is None else threshold
+        name_trigrams = self.trigrams(name)
+        total = len(name_trigrams) + len(self.query_trigrams)
+        # Mesmo princípio do RatioMatcher: o tamanho dos conjuntos limita o coeficiente máximo
+        if 2 * min(len(name_trigrams), len(self.query_trigrams)) <= threshold * total:
+            return None
+        similarity = 2 * len(name_trigrams & self.query_trigrams) / total
+        return similarity if similarity > threshold else None
+
+SEARCH_MATCHERS = {
+    "ratio": RatioMatcher,
+    "trigram": TrigramMatcher,
+}
+SEARCH_MATCHER = "ratio"
+
+SEARCH_MAX_RESULTS = 6
+SEARCH_PARTIAL_INTERVAL = 0.25  # segundos mínimos entre atualizações parciais enviadas à interface
+INDEX_SCORE_BLOCK = 256  # nomes do índice lidos e comparados de cada vez
+
+class TopMatches:
+    # Guarda só as k melhores correspondências num heap mínimo: o pior resultado fica sempre em heap[0]
+    def __init__(self, k):
+        self.k = k
+        self.heap = []
+
+    def is_full(self):
+        return len(self.heap) >= self.k
+
+    def threshold(self, floor):
+        # Com o heap cheio, só interessa o que empatar ou superar o pior resultado guardado;
+        # o empate é desfeito pelo caminho em push, para o resultado não depender da ordem de leitura
+        if not self.is_full():
+            return floor
+        return max(floor, math.nextafter(self.heap[0][0], -math.inf))
+
+    def is_complete(self):
+        # k correspondências exatas: nenhuma pesquisa adicional pode melhorar o resultado
+        return self.is_full() and self.heap[0][0] >= 1.0
+
+    def push(self, similarity, path):
+        if not self.is_full():
+            heapq.heappush(self.heap, (similarity, path))
+        elif (similarity, path) > self.heap[0]:
+            heapq.heapreplace(self.heap, (similarity, path))
+        else:
+            return False
+        return True
+
+    def merge(self, matches):
+        changed = False
+        for similarity, path in matches:
+            changed = self.push(similarity, path) or changed
+        return changed
+
+    def sorted(self):
+        return sorted(self.heap, reverse=True)
+
+class DirectoryCrawler:
+    # Uma única fila de pastas partilhada por todas as threads: cada thread tira a próxima pasta livre,
+    # por isso uma raiz muito grande é repartida entre todas em vez de ficar presa a um só worker.
+    # A leitura é I/O (scandir liberta o GIL); os DirEntry já trazem o tipo, sem stat por ficheiro.
+    def __init__(self, roots, excluded_dirs=SEARCH_EXCLUDED_DIRS, max_depth=SEARCH_MAX_DEPTH,
+                 workers=SEARCH_CRAWL_THREADS, cancel_event=None):
+        self.roots = roots
+        self.excluded_dirs = excluded_dirs
+        self.max_depth = max_depth
+        self.workers = workers
+        self.cancel_event = cancel_event or threading.Event()
+        self.stop_event = threading.Event()
+        self.condition = threading.Condition()
+        # As raízes entram intercaladas e a fila é FIFO, por isso todas avançam ao mesmo ritmo
+        self.queue = deque((root, 0) for root in roots)
+        self.active = 0
+
+    def stop(self):
+        self.stop_event.set()
+        with self.condition:
+            self.condition.notify_all()
+
+    def is_stopped(self):
+        return self.stop_event.is_set() or self.cancel_event.is_set()
+
+    def run(self, make_visitor):
+        # make_visitor é chamado uma vez por thread e devolve visit(entry), chamado para cada ficheiro
+        threads = [threading.Thread(target=self._crawl, args=(make_visitor(),), daemon=True)
+                   for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def _next_dir(self):
+        with self.condition:
+            while not self.queue and self.active and not self.is_stopped():
+                # O timeout garante que um cancelamento externo é visto mesmo sem notify
+                self.condition.wait(0.1)
+            if self.is_stopped() or not self.queue:
+                self.condition.notify_all()
+                return None
+            self.active += 1
+            return self.queue.popleft()
+
+    def _crawl(self, visit):
+        while True:
+            item = self._next_dir()
+            if item is None:
+                return
+            current_dir, depth = item
+            subdirs = []
+            try:
+                with os.scandir(current_dir) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if not is_excluded_dir(entry, self.excluded_dirs):
+                                    subdirs.append(entry.path)
+                            elif entry.is_file():
+                                visit(entry)
+                        except OSError:
+                            continue
+            except OSError:
+                pass
+            with self.condition:
+                if self.max_depth is None or depth < self.max_depth:
+                    self.queue.extend((subdir, depth + 1) for subdir in subdirs)
+                self.active -= 1
+                self.condition.notify_all()
+
+class PathSearcher:
+    def __init__(self, img_name, matcher=SEARCH_MATCHER, threshold=SEARCH_SIMILARITY_THRESHOLD,
+                 max_results=SEARCH_MAX_RESULTS, on_partial=None, cancel_event=None, roots=None):
+        self.img_name = img_name.lower()
+        self.max_results = max_results
+        self.matcher_name = matcher
+        self.threshold = threshold
+        self.matcher = SEARCH_MATCHERS[matcher](self.img_name, threshold)
+        self.on_partial = on_partial
+        self.cancel_event = cancel_event or threading.Event()
+        self.roots = SEARCH_ROOTS if roots is None else roots
+        self.top = TopMatches(max_results)
+        self.top_lock = threading.Lock()
+        self.last_partial = 0.0
+        self.search_image()
+
+    def is_cancelled(self):
+        return self.cancel_event.is_set()
+
+    def search_image(self):
+        search_index.refresh_in_background(self.roots)
+        if search_index.is_built(self.roots):
+            # Consulta o índice persistente; a atualização em segundo plano serve a próxima pesquisa
+            self._search_in_index()
+        else:
+            self._search_in_directories()
+
+    def _publish(self, force=False):
+        if self.on_partial is None or self.is_cancelled():
+            return
+        now = time.perf_counter()
+        if force or now - self.last_partial >= SEARCH_PARTIAL_INTERVAL:
+            self.last_partial = now
+            self.on_partial(self.get_paths())
+
+    def _search_in_index(self):
+        # As listas de ficheiros de cada trigrama da pesquisa são lidas da mais curta para a mais longa e
+        # cada nome novo é comparado por inteiro. Um nome que ainda não apareceu tem no máximo r trigramas
+        # em comum (r = listas por ler), logo nunca passa de 2r / (r + |q|): quando isso já não supera o
+        # limiar do top-K, as listas restantes (em geral as enormes, como "img") nem são lidas
+        query_size = len(self.matcher.query_trigrams)
+        seen = set()
+        for remaining, trigram in zip(range(query_size, 0, -1),
+                                      search_index.trigrams_by_frequency(self.matcher.query_trigrams)):
+            if 2 * remaining <= self.top.threshold(self.threshold) * (remaining + query_size):
+                return
+            new_ids = [file_id for file_id in search_index.get_trigram_files(trigram) if file_id not in seen]
+            seen.update(new_ids)
+            for start in range(0, len(new_ids), INDEX_SCORE_BLOCK):
+                if self.is_cancelled():
+                    return
+                self._publish()
+                rows = search_index.get_files(new_ids[start:start + INDEX_SCORE_BLOCK], self.roots)
+                if not self._score_rows(rows):
+                    return
+
+    def _score_rows(self, rows):
+        # Devolve False quando a pesquisa já terminou (top-K completo)
+        score = self.matcher.score
+        top = self.top
+        for name, path in rows:
+            similarity = score(name, top.threshold(self.threshold))
+            # Entradas do índice podem estar desatualizadas: só os candidatos ao top-K são verificados no disco
+            if similarity is not None and os.path.exists(path) and top.push(similarity, path):
+                if top.is_complete():
+                    return False
+        return True
+
+    def _search_in_directories(self):
+        crawler = DirectoryCrawler(self.roots, cancel_event=self.cancel_event)
+
+        def make_visitor():
+            # Cada thread tem o seu matcher (o SequenceMatcher guarda estado) e o seu top-K local;
+            # só o que melhora o top-K local é fundido, com lock, no resultado partilhado
+            matcher = SEARCH_MATCHERS[self.matcher_name](self.img_name, self.threshold)
+            local_top = TopMatches(self.max_results)
+
+            def visit(entry):
+                name, ext = os.path.splitext(entry.name.lower())
+                if ext not in IMAGE_EXTENSIONS:
+                    return
+                threshold = max(local_top.threshold(self.threshold), self.top.threshold(self.threshold))
+                similarity = matcher.score(name, threshold)  # Calcula a similaridade
+                if similarity is not None and local_top.push(similarity, entry.path):
+                    with self.top_lock:
+                        self.top.push(similarity, entry.path)
+                        if self.top.is_complete():
+                            crawler.stop()
+                        self._publish()
+            return visit
+
+        crawler.run(make_visitor)
+        with self.top_lock:
+            self._publish(force=True)
+
+    def get_paths(self):
+        return [path for _, path in self.top.sorted()]
+
+class ImageFileIndex:
+    # Índice persistente dos ficheiros de imagem nas pastas de pesquisa.
+    # Cada pasta guarda o seu mtime: só as pastas alteradas desde a última passagem voltam a ser lidas.
+    def __init__(self, path=None):
+        self.database = Database(None)
+        self._refresh_lock = threading.Lock()
+        if path:
+            self.open(path)
+
+    def open(self, path):
+        self.database.close()
+        self.database.path = path
+        with self.database.connection() as db_conn:
+            tables = {row[0] for row in db_conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            if "indexed_file" in tables and "indexed_trigram" not in tables:
+                # Índice de uma versão anterior, sem trigramas: é só uma cache, volta a ser construído
+                db_conn.execute("DROP TABLE indexed_file")
+                db_conn.execute("DROP TABLE IF EXISTS indexed_dir")
+                db_conn.execute("PRAGMA user_version = 0")
+            db_conn.execute("""
+                CREATE TABLE IF NOT EXISTS indexed_dir (
+                    path TEXT PRIMARY KEY,
+                    parent TEXT,
+                    mtime_ns INTEGER
+                )
+            """)
+            db_conn.execute("""
+                CREATE TABLE IF NOT EXISTS indexed_file (
+                    id INTEGER PRIMARY KEY,
+                    path TEXT NOT NULL UNIQUE,
+                    dir TEXT NOT NULL,
+                    name TEXT NOT NULL
+                )
+            """)
+            db_conn.execute("""
+                CREATE TABLE IF NOT EXISTS indexed_trigram (
+                    trigram TEXT NOT NULL,
+                    file_id INTEGER NOT NULL,
+                    PRIMARY KEY (trigram, file_id)
+                ) WITHOUT ROWID
+            """)
+            db_conn.execute("CREATE INDEX IF NOT EXISTS idx_indexed_dir_parent ON indexed_dir (parent)")
+            db_conn.execute("CREATE INDEX IF NOT EXISTS idx_indexed_file_dir ON indexed_file (dir)")
+            db_conn.execute("CREATE INDEX IF NOT EXISTS idx_indexed_trigram_file ON indexed_trigram (file_id)")
+            db_conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS indexed_file_forget_trigrams AFTER DELETE ON indexed_file
+                BEGIN
+                    DELETE FROM indexed_trigram WHERE file_id = old.id;
+                END
+            """)
+
+    def is_open(self):
+        return self.database.path is not None
+
+    def is_built(self, roots=None):
+        # user_version passa a 1 quando a primeira passagem completa termina; raízes que nunca foram
+        # percorridas (ex.: --root na linha de comando) ainda não estão no índice
+        if not self.is_open():
+            return False
+        db_conn = self.database.connection()
+        if db_conn.execute("PRAGMA user_version").fetchone()[0] < 1:
+            return False
+        for root in roots or []:
+            indexed = db_conn.execute("SELECT mtime_ns FROM indexed_dir WHERE path = ?", (root,)).fetchone()
+            if not indexed or indexed[0] is None:
+                return False
+        return True
+
+    @staticmethod
+    def _roots_filter(roots):
+        # Ficheiros diretamente numa raiz ou em qualquer pasta abaixo dela (mesmo intervalo que _forget_dir)
+        clauses, params = [], []
+        for root in roots:
+            clauses.append("(dir = ? OR (dir >= ? AND dir < ?))")
+            params.extend((root, root + os.sep, root + chr(ord(os.sep) + 1)))
+        return " OR ".join(clauses) or "1", params
+
+    def trigrams_by_frequency(self, query_trigrams):
+        # Do trigrama com menos ficheiros para o com mais
+        db_conn = self.database.connection()
+        frequency = {trigram: db_conn.execute("SELECT count(*) FROM indexed_trigram WHERE trigram = ?",
+                                              (trigram,)).fetchone()[0]
+                     for trigram in query_trigrams}
+        return sorted(query_trigrams, key=lambda trigram: (frequency[trigram], trigram))
+
+    def get_trigram_files(self, trigram):
+        return [file_id for (file_id,) in self.database.connection().execute(
+            "SELECT file_id FROM indexed_trigram WHERE trigram = ?", (trigram,))]
+
+    def get_files(self, file_ids, roots):
+        # [(nome, caminho)] pela ordem de file_ids, só dos ficheiros dentro das raízes;
+        # name é o nome do ficheiro sem extensão, em minúsculas
+        roots_filter, roots_params = self._roots_filter(roots)
+        placeholders = ", ".join("?" * len(file_ids))
+        rows = {file_id: (name, path) for file_id, name, path in self.database.connection().execute(f"""
+            SELECT id, name, path FROM indexed_file
+            WHERE id IN ({placeholders}) AND ({roots_filter})
+        """, [*file_ids, *roots_params])}
+        return [rows[file_id] for file_id in file_ids if file_id in rows]
+
+    def refresh_in_background(self, roots):
+        if not self.is_open() or self._refresh_lock.locked():
+            return
+        threading.Thread(target=self.refresh, args=(roots,), daemon=True).start()
+
+    def refresh(self, roots):
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            self._refresh(roots)
+        finally:
+            self._refresh_lock.release()
+
+    def _refresh(self, roots):
+        db_conn = self.database.connection()
+        known_mtimes = {}
+        children = {}
+        for path, parent, mtime_ns in db_conn.execute("SELECT path, parent, mtime_ns FROM indexed_dir"):
+            known_mtimes[path] = mtime_ns
+            children.setdefault(parent, []).append(path)
+
+        with db_conn:
+            db_conn.executemany("INSERT OR IGNORE INTO indexed_dir (path, parent) VALUES (?, NULL)",
+                                [(root,) for root in roots])
+
+        pending = deque((root, 0) for root in roots)
+        while pending:
+            current_dir, depth = pending.popleft()
+            descend = SEARCH_MAX_DEPTH is None or depth < SEARCH_MAX_DEPTH
+            try:
+                mtime_ns = os.stat(current_dir).st_mtime_ns
+            except OSError:
+                with db_conn:
+                    self._forget_dir(db_conn, current_dir)
+                continue
+
+            if known_mtimes.get(current_dir) == mtime_ns:
+                if descend:
+                    pending.extend((subdir, depth + 1) for subdir in children.get(current_dir, []))
+                continue
+
+            try:
+                subdirs, image_files = self._scan_dir(current_dir)
+            except OSError:
+                continue
+
+            with db_conn:
+                for vanished in set(children.get(current_dir, [])) - set(subdirs):
+                    self._forget_dir(db_conn, vanished)
+                db_conn.executemany("INSERT OR IGNORE INTO indexed_dir (path, parent) VALUES (?, ?)",
+                                    [(subdir, current_dir) for subdir in subdirs])
+                db_conn.execute("DELETE FROM indexed_file WHERE dir = ?", (current_dir,))
+                for path, name in image_files:
+                    file_id = db_conn.execute("INSERT INTO indexed_file (path, dir, name) VALUES (?, ?, ?)",
+                                              (path, current_dir, name)).lastrowid
+                    db_conn.executemany("INSERT INTO indexed_trigram (trigram, file_id) VALUES (?, ?)",
+                                        [(trigram, file_id) for trigram in trigrams(name)])
+                db_conn.execute("UPDATE indexed_dir SET mtime_ns = ? WHERE path = ?", (mtime_ns, current_dir))
+            if descend:
+                pending.extend((subdir, depth + 1) for subdir in subdirs)
+
+        with db_conn:
+            db_conn.execute("PRAGMA user_version = 1")
+
+    @staticmethod
+    def _scan_dir(current_dir):
+        subdirs, image_files = [], []
+        with os.scandir(current_dir) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not is_excluded_dir(entry):
+                            subdirs.append(entry.path)
+                    elif entry.is_file():
+                        name, ext = os.path.splitext(entry.name.lower())
+                        if ext in IMAGE_EXTENSIONS:
+                            image_files.append((entry.path, name))
+                except OSError:
+                    continue
+        return subdirs, image_files
+
+    @staticmethod
+    def _forget_dir(db_conn, path):
+        # Todos os caminhos abaixo de path ficam no intervalo [path + sep, path + (sep + 1))
+        lower = path + os.sep
+        upper = path + chr(ord(os.sep) + 1)
+        db_conn.execute("DELETE FROM indexed_file WHERE dir = ? OR (dir >= ? AND dir < ?)", (path, lower, upper))
+        db_conn.execute("DELETE FROM indexed_dir WHERE path = ? OR (path >= ? AND path < ?)", (path, lower, upper))
+
+# Aberto pela aplicação na pasta de dados; sem índice, a pesquisa percorre sempre as pastas
+search_index = ImageFileIndex()
@@ -0,0 +1,555 @@
+import os
+import sqlite3
+import threading
+import time
+import base64
+import io
+from datetime import datetime
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from .crypto import derive_vault_data_key, encrypt_stream, random_block
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".svg", ".bmp"}
+
+SQL_IN_BATCH = 500
+
+class Database:
+    # Uma ligação persistente por thread, reutilizada por todas as operações do cofre
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def connection(self):
+        db_conn = getattr(self._local, "connection", None)
+        if db_conn is None:
+            if self.path is None:
+                raise RuntimeError("A pasta de dados ainda não foi aberta (open_data_dir)")
+            db_conn = sqlite3.connect(self.path, cached_statements=256)
+            # Tem de vir antes do modo WAL: numa base de dados nova, é esse pragma que cria o cabeçalho
+            db_conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            db_conn.execute("PRAGMA journal_mode = WAL")
+            db_conn.execute("PRAGMA synchronous = NORMAL")
+            db_conn.execute("PRAGMA cache_size = -16384")
+            db_conn.execute("PRAGMA mmap_size = 268435456")
+            db_conn.execute("PRAGMA temp_store = MEMORY")
+            self._local.connection = db_conn
+        return db_conn
+
+    def close(self):
+        db_conn = getattr(self._local, "connection", None)
+        if db_conn is not None:
+            db_conn.close()
+            self._local.connection = None
+
+# O caminho só é conhecido quando a aplicação (ou a CLI) abre a pasta de dados
+database = Database(None)
+data_dir = None
+
+def default_data_dir():
+    # IMAGECRYPT_DATA_DIR tem prioridade; no Windows continua a ser %PROGRAMDATA%\ImageCrypt
+    if os.environ.get("IMAGECRYPT_DATA_DIR"):
+        return os.environ["IMAGECRYPT_DATA_DIR"]
+    if os.environ.get("PROGRAMDATA"):
+        return os.path.join(os.environ["PROGRAMDATA"], "ImageCrypt")
+    return os.path.join(os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share"), "ImageCrypt")
+
+def open_data_dir(path=None, progress_callback=None):
+    # progress_callback(feitos, total) acompanha as migrações, se as houver
+    global data_dir
+    data_dir = os.path.abspath(path or default_data_dir())
+    os.makedirs(data_dir, exist_ok=True)
+    database.close()
+    database.path = os.path.join(data_dir, "imagecrypt.db")
+    init_db(progress_callback)
+    return data_dir
+
+def data_path(name):
+    return os.path.join(data_dir, name)
+
+def find_existing_payload(cursor, vault_id, digest):
+    cursor.execute("SELECT id FROM image_payload WHERE vault_id = ? AND content_hash = ?", (vault_id, digest))
+    payload = cursor.fetchone()
+    return payload[0] if payload else None
+
+def reference_existing_payload(cursor, vault_id, digest):
+    payload_id = find_existing_payload(cursor, vault_id, digest)
+    if payload_id:
+        cursor.execute("UPDATE image_payload SET ref_count = ref_count + 1 WHERE id = ?", (payload_id,))
+    return payload_id
+
+def release_payloads(cursor, payload_ids):
+    # Um payload partilhado por várias das imagens apagadas perde todas essas referências de uma vez
+    payload_counts = Counter(payload_ids)
+    cursor.executemany("UPDATE image_payload SET ref_count = ref_count - ? WHERE id = ?",
+                       [(count, payload_id) for payload_id, count in payload_counts.items()])
+    payload_ids = list(payload_counts)
+    for start in range(0, len(payload_ids), SQL_IN_BATCH):
+        ids_chunk = payload_ids[start:start + SQL_IN_BATCH]
+        placeholders = ", ".join("?" * len(ids_chunk))
+        for table in ("payload_thumbnail", "payload_data"):
+            cursor.execute(f"""
+                DELETE FROM {table} WHERE payload_id IN (
+                    SELECT id FROM image_payload WHERE id IN ({placeholders}) AND ref_count <= 0
+                )
+            """, ids_chunk)
+        cursor.execute(f"DELETE FROM image_payload WHERE id IN ({placeholders}) AND ref_count <= 0", ids_chunk)
+
+def delete_payload(cursor, payload_id):
+    cursor.execute("DELETE FROM payload_data WHERE payload_id = ?", (payload_id,))
+    cursor.execute("DELETE FROM image_payload WHERE id = ?", (payload_id,))
+
+def init_db(progress_callback=None):
+    db_conn = database.connection()
+    cursor = db_conn.cursor()
+
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'vault'")
+    if not cursor.fetchone():
+        create_schema(db_conn)
+        return
+
+    cursor.execute("PRAGMA user_version")
+    user_version = cursor.fetchone()[0]
+    pending = [(version, migration) for version, migration in SCHEMA_MIGRATIONS if user_version < version]
+    if not pending:
+        return
+    # O VACUUM final conta como mais um passo: numa base de dados grande demora tanto como uma migração
+    total = len(pending) + 1
+    for done, (version, migration) in enumerate(pending):
+        if progress_callback:
+            progress_callback(done, total)
+        # Cada migração corre numa transação própria junto com a nova versão do esquema
+        cursor.execute("BEGIN")
+        try:
+            migration(db_conn)
+            cursor.execute(f"PRAGMA user_version = {version}")
+            db_conn.commit()
+        except Exception:
+            db_conn.rollback()
+            raise
+
+    if progress_callback:
+        progress_callback(len(pending), total)
+    # Devolve ao sistema o espaço libertado pelas tabelas reconstruídas
+    cursor.execute("VACUUM")
+    if progress_callback:
+        progress_callback(total, total)
+
+def create_schema(db_conn):
+    cursor = db_conn.cursor()
+    cursor.execute("BEGIN")
+    cursor.execute("""
+        CREATE TABLE vault (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            vault_name TEXT NOT NULL,
+            password TEXT,
+            created_at INTEGER NOT NULL,
+            encryption_key TEXT,
+            last_login INTEGER,
+            kdf_salt BLOB,
+            kdf_n INTEGER,
+            kdf_r INTEGER,
+            kdf_p INTEGER,
+            wrapped_key BLOB
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE image (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            vault_id INTEGER NOT NULL,
+            image_name TEXT NOT NULL,
+            payload_id INTEGER NOT NULL,
+            created_at INTEGER NOT NULL,
+            last_accessed INTEGER,
+            FOREIGN KEY (vault_id) REFERENCES vault (id),
+            FOREIGN KEY (payload_id) REFERENCES image_payload (id)
+        )
+    """)
+    create_payload_tables(cursor)
+    create_schema_indexes(cursor)
+    create_vault_indexes(cursor)
+    create_payload_indexes(cursor)
+    create_thumbnail_table(cursor)
+    cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    db_conn.commit()
+
+def create_schema_indexes(cursor):
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_image_vault_created ON image (vault_id, created_at)")
+
+def create_vault_indexes(cursor):
+    # O login procura o cofre pelo nome, sem distinguir maiúsculas: uma busca no índice e uma só derivação scrypt
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_vault_name ON vault (vault_name COLLATE NOCASE)")
+
+def create_payload_tables(cursor, payload_table="image_payload"):
+    # Os metadados (hash, contador de referências) ficam numa tabela pequena e o payload cifrado noutra:
+    # mudar ref_count ou content_hash não reescreve um registo de vários MB
+    cursor.execute(f"""
+        CREATE TABLE {payload_table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            vault_id INTEGER NOT NULL,
+            content_hash BLOB,
+            ref_count INTEGER NOT NULL DEFAULT 1,
+            FOREIGN KEY (vault_id) REFERENCES vault (id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE payload_data (
+            payload_id INTEGER PRIMARY KEY,
+            data BLOB NOT NULL,
+            FOREIGN KEY (payload_id) REFERENCES image_payload (id)
+        )
+    """)
+
+def create_thumbnail_table(cursor):
+    # Tabela à parte: ler uma miniatura não percorre as páginas de overflow do payload completo
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS payload_thumbnail (
+            payload_id INTEGER PRIMARY KEY,
+            data BLOB,
+            FOREIGN KEY (payload_id) REFERENCES image_payload (id)
+        )
+    """)
+
+def create_payload_indexes(cursor):
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_payload_vault_hash 
+        ON image_payload (vault_id, content_hash)
+    """)
+
+def migrate_image_payloads_to_blob(db_conn):
+    # Cofres antigos guardam "chave + base64" numa coluna TEXT; converte para BLOB com os bytes originais
+    cursor = db_conn.cursor()
+    cursor.execute("PRAGMA table_info(image)")
+    columns = [row[1] for row in cursor.fetchall()]
+    if "image_crypt_key" not in columns:
+        return
+
+    cursor.execute("SELECT id, encryption_key FROM vault")
+    vault_keys = {row[0]: row[1] or "" for row in cursor.fetchall()}
+
+    def converted_rows(legacy_cursor):
+        for img_id, vault_id, image_name, image_crypt_key, created_at, last_accessed in legacy_cursor:
+            encryption_key = vault_keys.get(vault_id, "")
+            if encryption_key and image_crypt_key.startswith(encryption_key):
+                image_crypt_key = image_crypt_key[len(encryption_key):]
+            yield img_id, vault_id, image_name, base64.b64decode(image_crypt_key), created_at, last_accessed
+
+    cursor.execute("""
+        CREATE TABLE image_blob (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            vault_id INTEGER NOT NULL,
+            image_name TEXT NOT NULL,
+            image_data BLOB NOT NULL,
+            created_at TEXT NOT NULL,
+            last_accessed TEXT,
+            FOREIGN KEY (vault_id) REFERENCES vault (id)
+        )
+    """)
+    legacy_cursor = db_conn.execute("""
+        SELECT id, vault_id, image_name, image_crypt_key, created_at, last_accessed FROM image
+    """)
+    cursor.executemany("""
+        INSERT INTO image_blob (id, vault_id, image_name, image_data, created_at, last_accessed)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, converted_rows(legacy_cursor))
+    cursor.execute("DROP TABLE image")
+    cursor.execute("ALTER TABLE image_blob RENAME TO image")
+
+def migrate_image_payloads_to_stream(db_conn):
+    # Cifra os payloads em claro (versão 1) com o formato por blocos
+    cursor = db_conn.cursor()
+    cursor.execute("SELECT id, encryption_key FROM vault")
+    data_keys = {row[0]: derive_vault_data_key(row[1] or "") for row in cursor.fetchall()}
+
+    cursor.execute("SELECT id FROM image")
+    for (img_id,) in cursor.fetchall():
+        vault_id, image_data = db_conn.execute(
+            "SELECT vault_id, image_data FROM image WHERE id = ?", (img_id,)
+        ).fetchone()
+        data_key = data_keys.get(vault_id) or derive_vault_data_key("")
+        encrypted = b"".join(encrypt_stream(data_key, io.BytesIO(image_data), len(image_data)))
+        db_conn.execute("UPDATE image SET image_data = ? WHERE id = ?", (encrypted, img_id))
+
+def parse_legacy_timestamp(value):
+    if value is None or isinstance(value, int):
+        return value
+    try:
+        return int(datetime.strptime(value, "%d/%m/%Y %H:%M:%S").timestamp())
+    except ValueError:
+        return 0
+
+def migrate_image_tables(db_conn):
+    # Antigas versões 3 (datas em segundos), 4 (payloads fora da tabela image) e 5 (payloads com dono, hash
+    # e contador de referências) numa só reconstrução por tabela: cada payload é copiado uma única vez, já
+    # para payload_data. Também serve bases de dados paradas na versão 3 ou 4 (legacy_timestamp aceita inteiros)
+    db_conn.create_function("legacy_timestamp", 1, parse_legacy_timestamp, deterministic=True)
+    cursor = db_conn.cursor()
+    cursor.execute("PRAGMA table_info(image)")
+    payloads_in_image = "image_data" in [row[1] for row in cursor.fetchall()]
+    create_payload_tables(cursor, "image_payload_v5")
+
+    if payloads_in_image:
+        cursor.execute("""
+            CREATE TABLE vault_v5 (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                vault_name TEXT NOT NULL,
+                password TEXT NOT NULL,
+                created_at INTEGER NOT NULL,
+                encryption_key TEXT,
+                last_login INTEGER
+            )
+        """)
+        cursor.execute("""
+            INSERT INTO vault_v5 (id, vault_name, password, created_at, encryption_key, last_login)
+            SELECT id, vault_name, password, legacy_timestamp(created_at), encryption_key, legacy_timestamp(last_login)
+            FROM vault
+        """)
+        # Cada imagem tinha o seu próprio payload: os ids passam a ser partilhados
+        cursor.execute("""
+            INSERT INTO image_payload_v5 (id, vault_id, content_hash, ref_count)
+            SELECT id, vault_id, NULL, 1 FROM image
+        """)
+        cursor.execute("INSERT INTO payload_data (payload_id, data) SELECT id, image_data FROM image")
+        cursor.execute("""
+            CREATE TABLE image_v5 (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                vault_id INTEGER NOT NULL,
+                image_name TEXT NOT NULL,
+                payload_id INTEGER NOT NULL,
+                created_at INTEGER NOT NULL,
+                last_accessed INTEGER,
+                FOREIGN KEY (vault_id) REFERENCES vault (id),
+                FOREIGN KEY (payload_id) REFERENCES image_payload (id)
+            )
+        """)
+        cursor.execute("""
+            INSERT INTO image_v5 (id, vault_id, image_name, payload_id, created_at, last_accessed)
+            SELECT id, vault_id, image_name, id, legacy_timestamp(created_at), legacy_timestamp(last_accessed)
+            FROM image
+        """)
+        cursor.execute("DROP TABLE image")
+        cursor.execute("DROP TABLE vault")
+        cursor.execute("ALTER TABLE vault_v5 RENAME TO vault")
+        cursor.execute("ALTER TABLE image_v5 RENAME TO image")
+    else:
+        # Versão 4: a tabela image já está no formato final, só os payloads mudam de tabela
+        cursor.execute("""
+            INSERT INTO image_payload_v5 (id, vault_id, content_hash, ref_count)
+            SELECT image_payload.id, image.vault_id, NULL, 1
+            FROM image JOIN image_payload ON image_payload.id = image.payload_id
+        """)
+        cursor.execute("""
+            INSERT INTO payload_data (payload_id, data)
+            SELECT image_payload.id, image_payload.data
+            FROM image JOIN image_payload ON image_payload.id = image.payload_id
+        """)
+        cursor.execute("DROP TABLE image_payload")
+
+    cursor.execute("ALTER TABLE image_payload_v5 RENAME TO image_payload")
+    create_schema_indexes(cursor)
+    create_payload_indexes(cursor)
+
+def migrate_payload_thumbnails(db_conn):
+    # As miniaturas das imagens existentes são geradas quando forem pedidas pela primeira vez
+    create_thumbnail_table(db_conn.cursor())
+
+def migrate_vault_key_wrapping(db_conn):
+    # A chave de um cofre antigo só pode ser cifrada com a senha, por isso isso acontece no seu próximo login
+    cursor = db_conn.cursor()
+    for column in ("kdf_salt BLOB", "kdf_n INTEGER", "kdf_r INTEGER", "kdf_p INTEGER", "wrapped_key BLOB"):
+        cursor.execute(f"ALTER TABLE vault ADD COLUMN {column}")
+
+def migrate_vault_login_by_name(db_conn):
+    # O login deixa de procurar pelo hash da senha: os nomes passam a ser únicos e a senha só fica
+    # guardada (sha256 antigo) nos cofres ainda não selados com scrypt
+    cursor = db_conn.cursor()
+    cursor.execute("""
+        CREATE TABLE vault_v8 (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            vault_name TEXT NOT NULL,
+            password TEXT,
+            created_at INTEGER NOT NULL,
+            encryption_key TEXT,
+            last_login INTEGER,
+            kdf_salt BLOB,
+            kdf_n INTEGER,
+            kdf_r INTEGER,
+            kdf_p INTEGER,
+            wrapped_key BLOB
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO vault_v8 (id, vault_name, password, created_at, encryption_key, last_login,
+                              kdf_salt, kdf_n, kdf_r, kdf_p, wrapped_key)
+        SELECT id, vault_name, CASE WHEN wrapped_key IS NULL THEN password END, created_at, encryption_key,
+               last_login, kdf_salt, kdf_n, kdf_r, kdf_p, wrapped_key
+        FROM vault
+    """)
+    cursor.execute("DROP TABLE vault")
+    cursor.execute("ALTER TABLE vault_v8 RENAME TO vault")
+
+    # Nomes repetidos: o cofre mais antigo mantém o nome, os restantes recebem um sufixo " (2)", " (3)", ...
+    cursor.execute("SELECT id, vault_name FROM vault ORDER BY id")
+    taken = set()
+    renamed = []
+    for vault_id, vault_name in cursor.fetchall():
+        new_name = vault_name
+        suffix = 2
+        while new_name.casefold() in taken:
+            new_name = f"{vault_name} ({suffix})"
+            suffix += 1
+        taken.add(new_name.casefold())
+        if new_name != vault_name:
+            renamed.append((new_name, vault_id))
+    cursor.executemany("UPDATE vault SET vault_name = ? WHERE id = ?", renamed)
+    create_vault_indexes(cursor)
+
+def migrate_incremental_auto_vacuum(db_conn):
+    # Só tem efeito depois do VACUUM que o init_db corre a seguir às migrações
+    db_conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
+def migrate_payload_data_to_own_table(db_conn):
+    # Os dados cifrados saem de image_payload para payload_data, com o mesmo id;
+    # bases de dados migradas de antes da versão 5 já chegam aqui nesse formato
+    cursor = db_conn.cursor()
+    cursor.execute("PRAGMA table_info(image_payload)")
+    if "data" not in [row[1] for row in cursor.fetchall()]:
+        return
+    create_payload_tables(cursor, "image_payload_v10")
+    cursor.execute("""
+        INSERT INTO image_payload_v10 (id, vault_id, content_hash, ref_count)
+        SELECT id, vault_id, content_hash, ref_count FROM image_payload
+    """)
+    cursor.execute("INSERT INTO payload_data (payload_id, data) SELECT id, data FROM image_payload")
+    cursor.execute("DROP TABLE image_payload")
+    cursor.execute("ALTER TABLE image_payload_v10 RENAME TO image_payload")
+    create_payload_indexes(cursor)
+
+# (versão, migração) aplicadas por ordem a bases de dados com PRAGMA user_version inferior
+SCHEMA_MIGRATIONS = [
+    (1, migrate_image_payloads_to_blob),
+    (2, migrate_image_payloads_to_stream),
+    (5, migrate_image_tables),
+    (6, migrate_payload_thumbnails),
+    (7, migrate_vault_key_wrapping),
+    (8, migrate_vault_login_by_name),
+    (9, migrate_incremental_auto_vacuum),
+    (10, migrate_payload_data_to_own_table),
+]
+SCHEMA_VERSION = SCHEMA_MIGRATIONS[-1][0]
+
+COMPACT_STEP_PAGES = 256
+COMPACT_STEP_PAUSE = 0.05
+
+def compact_database(cancel_event=None, step_pages=COMPACT_STEP_PAGES, pause=COMPACT_STEP_PAUSE):
+    # Devolve ao sistema as páginas livres aos poucos: cada passo é uma transação curta,
+    # e entre passos as escritas do cofre não ficam à espera de um VACUUM completo
+    db_conn = database.connection()
+    if db_conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return 0
+    reclaimed = 0
+    free_pages = db_conn.execute("PRAGMA freelist_count").fetchone()[0]
+    while free_pages and not (cancel_event is not None and cancel_event.is_set()):
+        # O pragma liberta uma página por passo da instrução: o executescript corre-a até ao fim
+        db_conn.executescript(f"PRAGMA incremental_vacuum({min(step_pages, free_pages)})")
+        remaining = db_conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if remaining >= free_pages:
+            break
+        reclaimed += free_pages - remaining
+        free_pages = remaining
+        time.sleep(pause)
+    if reclaimed:
+        # Em WAL, o ficheiro principal só encolhe quando o checkpoint copia as páginas truncadas
+        db_conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return reclaimed
+
+class DatabaseCompactor:
+    # Compactação em segundo plano numa thread própria, fora da fila de tarefas do utilizador
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="compact")
+        self.cancel_event = threading.Event()
+        self.pending = None
+
+    def schedule(self):
+        # Uma compactação que ainda não começou já vai apanhar as páginas libertadas entretanto
+        if self.pending is not None and not self.pending.running() and not self.pending.done():
+            return
+        self.pending = self.executor.submit(compact_database, self.cancel_event)
+
+    def shutdown(self):
+        self.cancel_event.set()
+        self.executor.shutdown(wait=True)
+
+# Passagens de dados aleatórios sobre o original antes de o apagar (0 = apenas apagar)
+WIPE_PASSES = 1
+WIPE_BLOCK_SIZE = 1024 * 1024
+WIPE_ALIGNMENT = 4096
+# Limite de escrita da limpeza, para não disputar o disco com as trancagens seguintes (None = sem limite)
+WIPE_RATE_LIMIT = 64 * 1024 * 1024
+
+class RateLimiter:
+    # Balde de tokens: o tempo parado só acumula crédito até um segundo de escrita
+    def __init__(self, bytes_per_second):
+        self.bytes_per_second = bytes_per_second
+        self.available = bytes_per_second
+        self.updated = time.perf_counter()
+
+    def consume(self, size):
+        now = time.perf_counter()
+        self.available = min(self.bytes_per_second,
+                             self.available + (now - self.updated) * self.bytes_per_second)
+        self.updated = now
+        self.available -= size
+        if self.available < 0:
+            time.sleep(-self.available / self.bytes_per_second)
+
+def wipe_file(path, passes=WIPE_PASSES, block_size=WIPE_BLOCK_SIZE, rate_limiter=None):
+    # Em SSDs e sistemas de ficheiros copy-on-write os blocos antigos podem sobreviver à sobrescrita;
+    # mesmo assim o conteúdo deixa de estar acessível pelo próprio ficheiro
+    size = os.path.getsize(path)
+    # Escritas em blocos inteiros: o último bloco parcial não obriga o sistema a ler antes de escrever
+    padded_size = -(-size // WIPE_ALIGNMENT) * WIPE_ALIGNMENT
+    block_size = max(WIPE_ALIGNMENT, block_size - block_size % WIPE_ALIGNMENT)
+    written = 0
+    if passes and padded_size:
+        with open(path, "r+b", buffering=0) as file:
+            for _ in range(passes):
+                block = memoryview(random_block(min(block_size, padded_size)))
+                file.seek(0)
+                offset = 0
+                while offset < padded_size:
+                    size_written = file.write(block[:padded_size - offset])
+                    offset += size_written
+                    if rate_limiter:
+                        rate_limiter.consume(size_written)
+                # Cada passagem tem de chegar ao disco antes da seguinte (e antes do unlink)
+                os.fsync(file.fileno())
+                written += offset
+    os.remove(path)
+    return written
+
+class WipeStage:
+    # Limpeza dos originais numa thread própria: a tarefa de trancagem termina sem esperar pelo disco
+    def __init__(self, passes=WIPE_PASSES, rate_limit=WIPE_RATE_LIMIT):
+        self.passes = passes
+        self.rate_limiter = RateLimiter(rate_limit) if rate_limit else None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="wipe")
+
+    def submit(self, image_paths):
+        # Devolve um future com (apagados, falhados), no mesmo formato das tarefas da interface
+        return self.executor.submit(self.wipe, list(image_paths))
+
+    def wipe(self, image_paths):
+        wiped, failed = [], []
+        for image_path in image_paths:
+            try:
+                wipe_file(image_path, self.passes, rate_limiter=self.rate_limiter)
+            except OSError as e:
+                failed.append((image_path, str(e)))
+            else:
+                wiped.append(image_path)
+        return wiped, failed
+
+    def shutdown(self):
+        # Os originais já trancados não podem ficar por apagar ao fechar a aplicação
+        self.executor.shutdown(wait=True)
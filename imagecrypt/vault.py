@@ -0,0 +1,613 @@
+import os
+import io
+import time
+import hmac
+import secrets
+import itertools
+import concurrent.futures
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from pathlib import Path
+
+from .lazy import PILImage, zipfile
+from .crypto import (DATA_KEY_SIZE, KDF_N, KDF_R, KDF_P, KDF_SALT_SIZE, hash_password, derive_vault_data_key,
+                     derive_key_encryption_key, wrap_data_key, unwrap_data_key, encrypted_stream_size,
+                     new_content_hash, encrypt_stream, decrypt_stream, encrypt_thumbnail, decrypt_thumbnail,
+                     STREAM_CHUNK_SIZE)
+from .storage import (database, IMAGE_EXTENSIONS, SQL_IN_BATCH, find_existing_payload, reference_existing_payload,
+                      release_payloads, delete_payload)
+
+# Chaves de dados dos cofres com sessão iniciada; só existem em memória
+unlocked_vault_keys = {}
+
+def seal_vault_key(cursor, vault_id, password, data_key):
+    salt = os.urandom(KDF_SALT_SIZE)
+    key_encryption_key = derive_key_encryption_key(password, salt)
+    cursor.execute("""
+        UPDATE vault 
+        SET kdf_salt = ?, kdf_n = ?, kdf_r = ?, kdf_p = ?, wrapped_key = ?, encryption_key = NULL, password = NULL
+        WHERE id = ?
+    """, (salt, KDF_N, KDF_R, KDF_P, wrap_data_key(key_encryption_key, vault_id, data_key), vault_id))
+
+def unlock_vault_key(cursor, vault_id, password):
+    cursor.execute("""
+        SELECT password, encryption_key, kdf_salt, kdf_n, kdf_r, kdf_p, wrapped_key FROM vault WHERE id = ?
+    """, (vault_id,))
+    vault = cursor.fetchone()
+    if not vault:
+        return None
+    legacy_hash, encryption_key, salt, n, r, p, wrapped_key = vault
+
+    if wrapped_key is None:
+        # Cofre antigo: a chave existente passa a ser guardada cifrada com a senha e deixa de estar em claro
+        if not legacy_hash or not hmac.compare_digest(legacy_hash, hash_password(password)):
+            return None
+        data_key = derive_vault_data_key(encryption_key or "")
+        seal_vault_key(cursor, vault_id, password, data_key)
+    else:
+        data_key = unwrap_data_key(derive_key_encryption_key(password, salt, n, r, p), vault_id, wrapped_key)
+        if data_key is None:
+            return None
+        if (n, r, p) != (KDF_N, KDF_R, KDF_P):
+            seal_vault_key(cursor, vault_id, password, data_key)
+
+    unlocked_vault_keys[vault_id] = data_key
+    return data_key
+
+def forget_vault_key(vault_id):
+    unlocked_vault_keys.pop(vault_id, None)
+
+def get_vault_data_key(cursor, vault_id):
+    data_key = unlocked_vault_keys.get(vault_id)
+    if data_key:
+        return data_key
+    cursor.execute("SELECT encryption_key FROM vault WHERE id = ?", (vault_id,))
+    encryption_key = cursor.fetchone()
+    if not encryption_key:
+        raise ValueError("Cofre não encontrado")
+    if encryption_key[0] is None:
+        raise PermissionError("Cofre bloqueado: inicie sessão para aceder às imagens")
+    return derive_vault_data_key(encryption_key[0])
+
+THUMBNAIL_SIZE = 96
+# Ao trancar, imagens que mesmo depois do draft passam deste número de pixels ficam sem miniatura:
+# descodificá-las por inteiro faria a memória crescer com o tamanho da imagem (digitalizações, panoramas)
+THUMBNAIL_MAX_PIXELS = 40_000_000
+# Miniatura adiada: não se grava nada e é gerada quando a imagem for mostrada pela primeira vez
+THUMBNAIL_DEFERRED = "deferred"
+
+def make_thumbnail(src, size=THUMBNAIL_SIZE, max_pixels=None):
+    # src é um caminho ou um ficheiro aberto; devolve PNG/JPEG pequeno, ou None se o PIL não o souber ler
+    # (ex.: SVG, ficheiro corrompido ou acima do limite de pixels do PIL)
+    try:
+        with PILImage.open(src) as img:
+            # Em JPEG, draft faz o descodificador reduzir logo a escala (1/2 a 1/8) em vez de ler a imagem inteira
+            img.draft("RGB", (size, size))
+            if max_pixels and img.width * img.height > max_pixels:
+                return THUMBNAIL_DEFERRED
+            img.thumbnail((size, size))
+            output = io.BytesIO()
+            if img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info:
+                img.convert("RGBA").save(output, format="PNG", optimize=True)
+            else:
+                img.convert("RGB").save(output, format="JPEG", quality=85)
+            return output.getvalue()
+    except Exception:
+        # Inclui o DecompressionBombError do PIL, que não é um OSError
+        return None
+
+def store_thumbnail(cursor, data_key, payload_id, thumbnail):
+    if thumbnail == THUMBNAIL_DEFERRED:
+        return
+    # data NULL marca imagens sem miniatura possível, para não voltarem a ser decifradas
+    sealed = encrypt_thumbnail(data_key, payload_id, thumbnail) if thumbnail else None
+    cursor.execute("INSERT OR IGNORE INTO payload_thumbnail (payload_id, data) VALUES (?, ?)", (payload_id, sealed))
+
+def has_thumbnail(cursor, payload_id):
+    cursor.execute("SELECT 1 FROM payload_thumbnail WHERE payload_id = ?", (payload_id,))
+    return cursor.fetchone() is not None
+
+def hash_image_file(data_key, img_file):
+    # Passagem só de leitura: o hash decide se a imagem já está no cofre antes de se cifrar o que quer que seja
+    content_hash = new_content_hash(data_key)
+    for chunk in iter(lambda: img_file.read(STREAM_CHUNK_SIZE), b""):
+        content_hash.update(chunk)
+    img_file.seek(0)
+    return content_hash.digest()
+
+def write_encrypted_image(db_conn, vault_id, image_name, created_at, img_file, plain_size, digest=None):
+    # digest: hash já calculado por quem chama (o lote calcula-o nos processos do pool)
+    cursor = db_conn.cursor()
+    data_key = get_vault_data_key(cursor, vault_id)
+    digest = digest or hash_image_file(data_key, img_file)
+    payload_id = reference_existing_payload(cursor, vault_id, digest)
+
+    if not payload_id:
+        content_hash = new_content_hash(data_key)
+        cursor.execute("INSERT INTO image_payload (vault_id, content_hash) VALUES (?, ?)", (vault_id, digest))
+        payload_id = cursor.lastrowid
+        cursor.execute("""
+            INSERT INTO payload_data (payload_id, data) 
+            VALUES (?, zeroblob(?))
+        """, (payload_id, encrypted_stream_size(plain_size)))
+
+        with db_conn.blobopen("payload_data", "data", payload_id) as blob:
+            for piece in encrypt_stream(data_key, img_file, plain_size, content_hash=content_hash):
+                blob.write(piece)
+
+        # O ficheiro mudou entre as duas leituras: o hash passa a ser o do que foi de facto cifrado, que pode
+        # afinal coincidir com outro payload (a cópia acabada de gravar é então descartada)
+        encrypted_digest = content_hash.digest()
+        if encrypted_digest != digest:
+            existing_payload_id = reference_existing_payload(cursor, vault_id, encrypted_digest)
+            if existing_payload_id:
+                delete_payload(cursor, payload_id)
+                payload_id = existing_payload_id
+            else:
+                cursor.execute("UPDATE image_payload SET content_hash = ? WHERE id = ?",
+                               (encrypted_digest, payload_id))
+
+    if not has_thumbnail(cursor, payload_id):
+        img_file.seek(0)
+        store_thumbnail(cursor, data_key, payload_id, make_thumbnail(img_file, max_pixels=THUMBNAIL_MAX_PIXELS))
+
+    cursor.execute("""
+        INSERT INTO image (vault_id, image_name, payload_id, created_at) 
+        VALUES (?, ?, ?, ?)
+    """, (vault_id, image_name, payload_id, created_at))
+    return cursor.lastrowid
+
+def iter_decoded_image(db_conn, img_id, vault_id):
+    cursor = db_conn.cursor()
+    cursor.execute("SELECT payload_id FROM image WHERE vault_id = ? AND id = ?", (vault_id, img_id))
+    image = cursor.fetchone()
+    if not image:
+        raise LookupError("Imagem não encontrada")
+    data_key = get_vault_data_key(cursor, vault_id)
+
+    with db_conn.blobopen("payload_data", "data", image[0], readonly=True) as blob:
+        def read_at(offset, size):
+            blob.seek(offset)
+            return blob.read(size)
+
+        yield from decrypt_stream(data_key, read_at)
+
+def get_image_thumbnail(vault_id, img_id):
+    # Só a miniatura é decifrada; imagens gravadas antes das miniaturas são decifradas uma única vez
+    db_conn = database.connection()
+    cursor = db_conn.cursor()
+    cursor.execute("""
+        SELECT image.payload_id, payload_thumbnail.payload_id, payload_thumbnail.data
+        FROM image LEFT JOIN payload_thumbnail ON payload_thumbnail.payload_id = image.payload_id
+        WHERE image.vault_id = ? AND image.id = ?
+    """, (vault_id, img_id))
+    image = cursor.fetchone()
+    if not image:
+        raise LookupError("Imagem não encontrada")
+    payload_id, stored, sealed = image
+    data_key = get_vault_data_key(cursor, vault_id)
+    if stored is not None:
+        return decrypt_thumbnail(data_key, payload_id, sealed) if sealed is not None else None
+
+    thumbnail = make_thumbnail(io.BytesIO(b"".join(iter_decoded_image(db_conn, img_id, vault_id))))
+    with db_conn:
+        store_thumbnail(cursor, data_key, payload_id, thumbnail)
+    return thumbnail
+
+def format_timestamp(timestamp):
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp).strftime("%d/%m/%Y %H:%M:%S")
+
+def create_vault(password, vault_name):
+    created_at = int(time.time())
+    # Chave de dados aleatória; na base de dados fica apenas cifrada com a chave derivada da senha
+    data_key = secrets.token_bytes(DATA_KEY_SIZE)
+
+    with database.connection() as cv_db_conn:
+        cursor = cv_db_conn.cursor()
+        cursor.execute("""
+            INSERT INTO vault (created_at, vault_name) 
+            VALUES (?, ?)
+        """, (created_at, vault_name))
+        vault_id = cursor.lastrowid
+        seal_vault_key(cursor, vault_id, password, data_key)
+    return vault_id
+
+def login_vault(vault_name, password):
+    # Devolve None para senha errada ou cofre inexistente, sem distinguir os dois casos
+    db_conn = database.connection()
+    cursor = db_conn.cursor()
+
+    cursor.execute("SELECT id, vault_name, last_login FROM vault WHERE vault_name = ? COLLATE NOCASE",
+                   (vault_name,))
+    vault = cursor.fetchone()
+    if not vault:
+        return None
+    with db_conn:
+        data_key = unlock_vault_key(cursor, vault[0], password)
+    if not data_key:
+        return None
+    vault_id, vault_name, last_login = vault
+    atual_login = int(time.time())
+    return vault_id, vault_name, last_login, atual_login
+
+def get_vault_images_page(vault_id, after=None, limit=200):
+    # Paginação por chave (created_at, id): cada página é uma busca direta no índice
+    cursor = database.connection().cursor()
+    if after is None:
+        cursor.execute("""
+            SELECT id, image_name, created_at FROM image 
+            WHERE vault_id = ? 
+            ORDER BY created_at, id 
+            LIMIT ?
+        """, (vault_id, limit))
+    else:
+        cursor.execute("""
+            SELECT id, image_name, created_at FROM image 
+            WHERE vault_id = ? AND (created_at, id) > (?, ?) 
+            ORDER BY created_at, id 
+            LIMIT ?
+        """, (vault_id, after[0], after[1], limit))
+    return cursor.fetchall()
+
+def update_last_login(vault_id, last_login):
+    with database.connection() as ll_db_conn:
+        ll_db_conn.execute("""
+                        UPDATE vault 
+                        SET last_login = ?
+                        WHERE id = ?
+                    """, (last_login, vault_id))
+    return True
+
+def verify_if_vault_name_exists(vault_name):
+    cursor = database.connection().cursor()
+    cursor.execute("SELECT id FROM vault WHERE vault_name = ? COLLATE NOCASE", (vault_name,))
+    return cursor.fetchone() is not None
+
+def encode_image(vault_id, image_path, img_name=None):
+    # Corre nas tarefas em segundo plano: os erros sobem para a tarefa, que os junta ao aviso final
+    pimage_path = Path(image_path).resolve()
+    image_name = img_name if img_name else pimage_path.stem
+    created_at = int(time.time())
+
+    with database.connection() as ei_db_conn, open(pimage_path, "rb") as img_file:
+        plain_size = os.fstat(img_file.fileno()).st_size
+        return write_encrypted_image(ei_db_conn, vault_id, image_name, created_at, img_file, plain_size)
+
+BATCH_WRITE_ROWS = 64
+BATCH_WRITE_BYTES = 64 * 1024 * 1024
+
+def list_folder_images(folder):
+    image_paths = []
+    for root, _, files in os.walk(folder):
+        for file_name in files:
+            if os.path.splitext(file_name)[1].lower() in IMAGE_EXTENSIONS:
+                image_paths.append(os.path.join(root, file_name))
+    return sorted(image_paths)
+
+# Imagens acima deste tamanho não passam pelo pool: são cifradas bloco a bloco diretamente para a base de dados
+LOCK_STREAM_THRESHOLD = 32 * 1024 * 1024
+
+def hash_image_path(data_key, image_path):
+    # Executada nos processos do pool: primeira passagem, só de leitura, para detetar duplicados antes de cifrar
+    with open(image_path, "rb") as img_file:
+        plain_size = os.fstat(img_file.fileno()).st_size
+        return hash_image_file(data_key, img_file), plain_size
+
+def encrypt_image_file(data_key, image_path):
+    # Executada nos processos do pool: lê e cifra a imagem, devolvendo o hash, o payload e a miniatura
+    # (ainda em claro: só é cifrada depois de se conhecer o id do payload)
+    content_hash = new_content_hash(data_key)
+    with open(image_path, "rb") as img_file:
+        plain_size = os.fstat(img_file.fileno()).st_size
+        payload = b"".join(encrypt_stream(data_key, img_file, plain_size, content_hash=content_hash))
+        img_file.seek(0)
+        thumbnail = make_thumbnail(img_file, max_pixels=THUMBNAIL_MAX_PIXELS)
+    return content_hash.digest(), payload, thumbnail
+
+def lock_images_batch(vault_id, image_paths, progress_callback=None, max_workers=None, cancel_event=None):
+    locked, failed = [], []
+    total = len(image_paths)
+    created_at = int(time.time())
+
+    db_conn = database.connection()
+    cursor = db_conn.cursor()
+    data_key = get_vault_data_key(cursor, vault_id)
+    # payload None: a imagem já está no cofre (ou mais acima em rows) e só ganha uma referência
+    rows = []
+    rows_bytes = 0
+    rows_digests = set()
+    # Hash -> ficheiros iguais ao que está a ser cifrado, que entram logo a seguir a ele sem serem cifrados
+    encrypting = {}
+
+    def flush_rows():
+        # Uma transação por bloco: o lock de escrita é largado entre blocos (a interface consegue gravar
+        # o último login a meio de um lote longo) e uma falha só perde o bloco em curso
+        with db_conn:
+            image_rows = []
+            for image_name, digest, payload, thumbnail in rows:
+                payload_id = reference_existing_payload(cursor, vault_id, digest)
+                if not payload_id:
+                    if payload is None:
+                        raise LookupError("O payload da imagem duplicada já não existe no cofre")
+                    cursor.execute("INSERT INTO image_payload (vault_id, content_hash) VALUES (?, ?)",
+                                   (vault_id, digest))
+                    payload_id = cursor.lastrowid
+                    cursor.execute("INSERT INTO payload_data (payload_id, data) VALUES (?, ?)", (payload_id, payload))
+                if payload is not None:
+                    store_thumbnail(cursor, data_key, payload_id, thumbnail)
+                image_rows.append((vault_id, image_name, payload_id, created_at))
+            cursor.executemany("""
+                INSERT INTO image (vault_id, image_name, payload_id, created_at) 
+                VALUES (?, ?, ?, ?)
+            """, image_rows)
+        rows.clear()
+        rows_digests.clear()
+
+    def add_reference(image_path, digest):
+        rows.append((Path(image_path).stem, digest, None, None))
+        locked.append(image_path)
+
+    workers = max_workers or os.cpu_count() or 1
+    # Limita os ficheiros em memória ao dobro dos processos ativos
+    max_in_flight = 2 * workers
+
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        pending_paths = iter(image_paths)
+        # future -> (etapa, caminho, hash da primeira passagem)
+        in_flight = {}
+
+        def submit_encryption(image_path, digest):
+            in_flight[executor.submit(encrypt_image_file, data_key, image_path)] = ("encrypt", image_path, digest)
+
+        while True:
+            while len(in_flight) < max_in_flight:
+                # Cancelar deixa de submeter ficheiros; os que já estão a ser cifrados ainda são gravados
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                image_path = next(pending_paths, None)
+                if image_path is None:
+                    break
+                in_flight[executor.submit(hash_image_path, data_key, image_path)] = ("hash", image_path, None)
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, image_path, digest = in_flight.pop(future)
+                try:
+                    if stage == "hash":
+                        digest, plain_size = future.result()
+                        if digest in encrypting:
+                            encrypting[digest].append(image_path)
+                            continue
+                        if digest in rows_digests or find_existing_payload(cursor, vault_id, digest):
+                            # Duplicado: nem é cifrado nem gravado, só referencia o payload existente
+                            add_reference(image_path, digest)
+                        elif plain_size > LOCK_STREAM_THRESHOLD:
+                            # Imagem grande: cifrada aqui, em streaming, na sua própria transação
+                            with db_conn, open(image_path, "rb") as img_file:
+                                write_encrypted_image(db_conn, vault_id, Path(image_path).stem, created_at,
+                                                      img_file, plain_size, digest)
+                            locked.append(image_path)
+                        else:
+                            encrypting[digest] = []
+                            submit_encryption(image_path, digest)
+                            continue
+                    else:
+                        duplicates = encrypting.pop(digest, [])
+                        try:
+                            encrypted_digest, payload, thumbnail = future.result()
+                        except Exception:
+                            # Os iguais a este já não têm em quem se apoiar: são cifrados por conta própria
+                            for duplicate_path in duplicates:
+                                submit_encryption(duplicate_path, None)
+                            raise
+                        rows.append((Path(image_path).stem, encrypted_digest, payload, thumbnail))
+                        rows_digests.add(encrypted_digest)
+                        rows_bytes += len(payload)
+                        locked.append(image_path)
+                        for duplicate_path in duplicates:
+                            if encrypted_digest == digest:
+                                add_reference(duplicate_path, digest)
+                            else:
+                                # O ficheiro mudou entre as duas leituras: os iguais ao original não são iguais a este
+                                submit_encryption(duplicate_path, None)
+                except Exception as e:
+                    failed.append((image_path, str(e)))
+
+                if progress_callback:
+                    progress_callback(len(locked) + len(failed), total)
+
+            if len(rows) >= BATCH_WRITE_ROWS or rows_bytes >= BATCH_WRITE_BYTES:
+                flush_rows()
+                rows_bytes = 0
+
+    if rows:
+        flush_rows()
+    return locked, failed
+
+
+# Imagens cifradas acima deste tamanho são decifradas bloco a bloco diretamente para o destino
+EXPORT_STREAM_THRESHOLD = 32 * 1024 * 1024
+
+def get_images_export_info(db_conn, vault_id, image_ids):
+    export_info = []
+    for start in range(0, len(image_ids), SQL_IN_BATCH):
+        ids_chunk = list(image_ids[start:start + SQL_IN_BATCH])
+        placeholders = ", ".join("?" * len(ids_chunk))
+        export_info.extend(db_conn.execute(f"""
+            SELECT image.id, image.image_name, length(payload_data.data) 
+            FROM image JOIN payload_data ON payload_data.payload_id = image.payload_id 
+            WHERE image.vault_id = ? AND image.id IN ({placeholders})
+        """, [vault_id] + ids_chunk).fetchall())
+    return export_info
+
+def decode_image_bytes(vault_id, img_id):
+    return b"".join(iter_decoded_image(database.connection(), img_id, vault_id))
+
+# Assinaturas (magic bytes) -> (extensão, vale a pena comprimir)
+IMAGE_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", ".png", False),
+    (b"\xff\xd8\xff", ".jpg", False),
+    (b"GIF87a", ".gif", False),
+    (b"GIF89a", ".gif", False),
+    (b"BM", ".bmp", True),
+    (b"II*\x00", ".tif", True),
+    (b"MM\x00*", ".tif", True),
+]
+
+def detect_image_format(head):
+    for signature, extension, compressible in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return extension, compressible
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp", False
+    if b"<svg" in head[:1024].lower():
+        return ".svg", True
+    return ".png", True
+
+class ZipExportWriter:
+    def __init__(self, zip_path):
+        self.zipf = zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED, allowZip64=True)
+
+    def write(self, entry_name, chunks, compressible=True):
+        zinfo = zipfile.ZipInfo(entry_name, date_time=time.localtime()[:6])
+        zinfo.external_attr = 0o600 << 16
+        # PNG/JPEG/GIF/WEBP já vêm comprimidos: guardar sem deflate poupa CPU sem perder espaço
+        zinfo.compress_type = zipfile.ZIP_DEFLATED if compressible else zipfile.ZIP_STORED
+        with self.zipf.open(zinfo, "w", force_zip64=True) as entry:
+            for chunk in chunks:
+                entry.write(chunk)
+
+    def close(self):
+        self.zipf.close()
+
+class FileExportWriter:
+    # Exportação de uma única imagem para o caminho escolhido pelo utilizador
+    def __init__(self, file_path):
+        self.file_path = file_path
+
+    def write(self, entry_name, chunks, compressible=True):
+        with open(self.file_path, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+
+    def close(self):
+        pass
+
+class DirectoryExportWriter:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, entry_name, chunks, compressible=True):
+        with open(os.path.join(self.directory, entry_name), "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+
+    def close(self):
+        pass
+
+def unlock_images_batch(vault_id, image_ids, writer, progress_callback=None, max_workers=None, cancel_event=None):
+    exported, failed = [], []
+    total = len(image_ids)
+
+    db_conn = database.connection()
+    try:
+        export_info = get_images_export_info(db_conn, vault_id, image_ids)
+        found_ids = {img_id for img_id, _, _ in export_info}
+        failed.extend((img_id, "Imagem não encontrada") for img_id in image_ids if img_id not in found_ids)
+
+        small_images = [info for info in export_info if info[2] <= EXPORT_STREAM_THRESHOLD]
+        large_images = [info for info in export_info if info[2] > EXPORT_STREAM_THRESHOLD]
+
+        def write_entry(img_id, image_name, chunks):
+            try:
+                chunks = iter(chunks)
+                first_chunk = next(chunks, b"")
+                extension, compressible = detect_image_format(first_chunk)
+                entry_name = f"{image_name}_{len(exported) + 1}{extension}"
+                writer.write(entry_name, itertools.chain([first_chunk], chunks), compressible)
+            except Exception as e:
+                failed.append((img_id, str(e)))
+            else:
+                exported.append(img_id)
+            if progress_callback:
+                progress_callback(len(exported) + len(failed), total)
+
+        workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        # Fila limitada: no máximo o dobro das threads com imagens decifradas à espera do escritor
+        max_in_flight = 2 * workers
+
+        with ThreadPoolExecutor(workers) as executor:
+            pending_images = iter(small_images)
+            in_flight = {}
+
+            while True:
+                while len(in_flight) < max_in_flight:
+                    if cancel_event is not None and cancel_event.is_set():
+                        break
+                    info = next(pending_images, None)
+                    if info is None:
+                        break
+                    in_flight[executor.submit(decode_image_bytes, vault_id, info[0])] = info
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    img_id, image_name, _ = in_flight.pop(future)
+                    try:
+                        image_data = future.result()
+                    except Exception as e:
+                        failed.append((img_id, str(e)))
+                        if progress_callback:
+                            progress_callback(len(exported) + len(failed), total)
+                    else:
+                        write_entry(img_id, image_name, [image_data])
+
+        for img_id, image_name, _ in large_images:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            write_entry(img_id, image_name, iter_decoded_image(db_conn, img_id, vault_id))
+
+        return exported, failed
+    finally:
+        writer.close()
+
+def delete_images_batch(vault_id, image_ids, progress_callback=None, cancel_event=None):
+    # Toda a seleção é apagada numa só transação (um único fsync), em blocos de DELETE ... WHERE id IN (...)
+    deleted, failed = [], []
+    total = len(image_ids)
+    image_ids = list(image_ids)
+
+    db_conn = database.connection()
+    cursor = db_conn.cursor()
+    cursor.execute("BEGIN")
+    try:
+        for start in range(0, total, SQL_IN_BATCH):
+            # Cancelar mantém o que já foi apagado: os blocos seguintes ficam por apagar
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            ids_chunk = image_ids[start:start + SQL_IN_BATCH]
+            placeholders = ", ".join("?" * len(ids_chunk))
+            # Só as imagens deste cofre: ids de outro cofre, ou que já não existem, ficam como falhadas
+            cursor.execute(f"SELECT id, payload_id FROM image WHERE vault_id = ? AND id IN ({placeholders})",
+                           [vault_id, *ids_chunk])
+            found = dict(cursor.fetchall())
+            cursor.execute(f"DELETE FROM image WHERE vault_id = ? AND id IN ({placeholders})", [vault_id, *ids_chunk])
+            release_payloads(cursor, list(found.values()))
+            for img_id in ids_chunk:
+                if img_id in found:
+                    deleted.append(img_id)
+                else:
+                    failed.append((img_id, "Imagem não encontrada"))
+            if progress_callback:
+                progress_callback(len(deleted) + len(failed), total)
+        db_conn.commit()
+    except Exception:
+        db_conn.rollback()
+        raise
+    return deleted, failed